@@ -0,0 +1,35 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+
+
+class PaginacionCursor(CursorPagination):
+    """
+    Paginación por cursor para todos los listados. Cada página se obtiene con un filtro
+    sobre columnas indexadas (`WHERE id > ...`), así que su costo no crece con la tabla
+    y no se repiten ni saltan filas si se insertan registros entre una página y otra.
+
+    El orden se toma del atributo `orden_paginacion` de la vista (o de la @action, que
+    acepta el mismo argumento) y, si no existe, es por `id`.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        orden = getattr(view, 'orden_paginacion', None) or self.ordering
+        return (orden,) if isinstance(orden, str) else tuple(orden)
+
+    async def apaginar_queryset(self, queryset, request, view=None):
+        """
+        Versión para vistas async: ejecuta paginate_queryset de DRF en el hilo de las
+        consultas sync. Acepta un HttpRequest de Django (las vistas async no pasan por DRF).
+        """
+        if not isinstance(request, Request):
+            request = Request(request)
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def datos_paginados(self, data):
+        """Cuerpo de la respuesta paginada, para las vistas que no usan Response de DRF."""
+        return {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
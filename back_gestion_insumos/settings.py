@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,7 +36,7 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
-
+    "DEFAULT_PAGINATION_CLASS": "back_gestion_insumos.pagination.PaginacionCursor",
 }
 
 SIMPLE_JWT = {
@@ -104,6 +106,26 @@ DATABASES = {
     }
 }
 
+# Caché (reportes, tablas de cuotas y versiones para ETag). Debe ser compartida por todos los
+# procesos (workers del servidor y comandos de manage.py): por defecto en archivos, en el
+# directorio CACHE_DIR; con REDIS_URL definida se usa Redis (requiere el paquete `redis`).
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'gestion-insumos-cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
 
 
 # Password validation
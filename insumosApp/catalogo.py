@@ -0,0 +1,103 @@
+import threading
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+CLAVE_VERSION_CATALOGO = "insumos:catalogo:version"
+
+# Copia del catálogo en este proceso; se reconstruye cuando cambia la versión global
+_catalogo = {'version': None, 'insumos': [], 'por_nombre': {}}
+_bloqueo = threading.Lock()
+
+
+def version_catalogo():
+    """
+    Devuelve la versión global del catálogo guardada en la caché compartida, creándola
+    si no existe. Una versión nueva parte de la hora actual en nanosegundos, así que
+    nunca repite una anterior.
+    """
+    version = cache.get(CLAVE_VERSION_CATALOGO)
+    if version is None:
+        cache.add(CLAVE_VERSION_CATALOGO, time.time_ns(), None)
+        version = cache.get(CLAVE_VERSION_CATALOGO, time.time_ns())
+    return version
+
+
+def renovar_catalogo():
+    """
+    Marca el catálogo como desactualizado en todos los procesos al confirmar la transacción.
+    """
+    transaction.on_commit(lambda: cache.delete(CLAVE_VERSION_CATALOGO))
+
+
+def _insumos_ordenados():
+    from .models import Insumo
+
+    return Insumo.objects.activos().order_by('nombre', 'id')
+
+
+def _construir(version):
+    return _armar(version, _insumos_ordenados())
+
+
+async def _aconstruir(version):
+    return _armar(version, [insumo async for insumo in _insumos_ordenados()])
+
+
+def _armar(version, instancias):
+    from .serializers import InsumoSerializer
+
+    insumos = [dict(fila) for fila in InsumoSerializer(instancias, many=True).data]
+    por_nombre = {}
+    for insumo in insumos:
+        por_nombre.setdefault(insumo['nombre'], insumo['id'])
+    return {'version': version, 'insumos': insumos, 'por_nombre': por_nombre}
+
+
+def obtener_catalogo():
+    """
+    Devuelve el catálogo de insumos (serializado, ordenado por nombre). Mientras la versión
+    global no cambie se responde desde la copia del proceso, sin consultar la base de datos.
+    """
+    global _catalogo
+    version = version_catalogo()
+    catalogo = _catalogo
+    if catalogo['version'] != version:
+        with _bloqueo:
+            if _catalogo['version'] != version:
+                _catalogo = _construir(version)
+            catalogo = _catalogo
+    return catalogo
+
+
+async def aversion_catalogo():
+    version = await cache.aget(CLAVE_VERSION_CATALOGO)
+    if version is None:
+        await cache.aadd(CLAVE_VERSION_CATALOGO, time.time_ns(), None)
+        version = await cache.aget(CLAVE_VERSION_CATALOGO, time.time_ns())
+    return version
+
+
+async def aobtener_catalogo():
+    """
+    Versión async de obtener_catalogo. La reconstrucción se hace fuera del bloqueo
+    (no se puede esperar una consulta mientras se lo retiene); si dos peticiones
+    reconstruyen a la vez, se queda con la primera.
+    """
+    global _catalogo
+    version = await aversion_catalogo()
+    catalogo = _catalogo
+    if catalogo['version'] != version:
+        nuevo = await _aconstruir(version)
+        with _bloqueo:
+            if _catalogo['version'] != version:
+                _catalogo = nuevo
+            catalogo = _catalogo
+    return catalogo
+
+
+def id_insumo_por_nombre(nombre):
+    """
+    Resuelve el id de un insumo a partir de su nombre usando el catálogo; None si no existe.
+    """
+    return obtener_catalogo()['por_nombre'].get(nombre)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from insumosApp.models import Insumo
+
+
+class Command(BaseCommand):
+    help = "Guarda un corte con el saldo actual de cada insumo (ejecutar periódicamente, por ejemplo con cron)."
+
+    def handle(self, *args, **options):
+        cortes = Insumo.objects.registrar_cortes()
+        self.stdout.write(self.style.SUCCESS(f"Se registraron {len(cortes)} cortes de inventario."))
@@ -1,8 +1,103 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Case, When, Value, Sum
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .catalogo import renovar_catalogo
 
 # from subjectsApp.models import Clase
 
+class InsumoManager(models.Manager):
+    def ajustar_stock(self, ajustes, tipo, clase=None):
+        """
+        Suma a `cantidad_total` la cantidad indicada para cada insumo ({insumo_id: cantidad})
+        en un solo UPDATE con expresiones F(). Las cantidades negativas descuentan stock.
+        Cada ajuste queda registrado en el libro de movimientos de inventario.
+        """
+        ajustes = {insumo_id: cantidad for insumo_id, cantidad in ajustes.items() if cantidad}
+        if not ajustes:
+            return 0
+
+        campo = self.model._meta.get_field('cantidad_total')
+        with transaction.atomic():
+            actualizados = self.filter(id__in=ajustes).update(
+                cantidad_total=F('cantidad_total') + Case(
+                    *[When(id=insumo_id, then=Value(cantidad, output_field=campo)) for insumo_id, cantidad in ajustes.items()],
+                    output_field=campo,
+                )
+            )
+            # Registrar después del UPDATE, con los insumos ya bloqueados, para que la fecha
+            # de cada movimiento sea posterior a cualquier corte que haya leído el saldo anterior
+            MovimientoInventario.objects.registrar(ajustes, tipo, clase=clase)
+            # El catálogo incluye el stock de cada insumo
+            renovar_catalogo()
+        return actualizados
+
+    def descontar_stock(self, insumo_id, cantidad, tipo, clase=None):
+        """
+        Descuenta `cantidad` del insumo solo si alcanza, con un único
+        UPDATE ... WHERE id = ? AND cantidad_total >= ?. Devuelve False si no había stock
+        suficiente (o el insumo no existe); en ese caso no se modifica nada.
+        """
+        with transaction.atomic():
+            descontado = self.filter(id=insumo_id, cantidad_total__gte=cantidad).update(
+                cantidad_total=F('cantidad_total') - cantidad
+            )
+            if not descontado:
+                return False
+            MovimientoInventario.objects.registrar({insumo_id: -cantidad}, tipo, clase=clase)
+            renovar_catalogo()
+        return True
+
+    def activos(self):
+        return self.filter(activo=True)
+
+    def dar_de_baja(self, insumo_id):
+        """
+        Elimina un insumo sin borrar su historia: lo marca como inactivo y retira su stock
+        con un movimiento de baja, así el libro sigue cuadrando con `cantidad_total`.
+        """
+        with transaction.atomic():
+            insumo = self.select_for_update().get(id=insumo_id)
+            if insumo.cantidad_total:
+                MovimientoInventario.objects.registrar({insumo.id: -insumo.cantidad_total}, 'baja')
+            insumo.activo = False
+            insumo.cantidad_total = 0
+            insumo.save(update_fields=['activo', 'cantidad_total'])
+        return insumo
+
+    def saldo_al(self, insumo_id, fecha):
+        """
+        Devuelve el saldo de un insumo en una fecha dada: parte del último corte anterior
+        a la fecha y suma solo los movimientos posteriores a ese corte.
+        """
+        corte = (
+            CorteInventario.objects.filter(insumo_id=insumo_id, fecha__lte=fecha)
+            .order_by('-fecha')
+            .first()
+        )
+        movimientos = MovimientoInventario.objects.filter(insumo_id=insumo_id, fecha__lte=fecha)
+        saldo = 0
+        if corte is not None:
+            movimientos = movimientos.filter(fecha__gt=corte.fecha)
+            saldo = corte.saldo
+        return saldo + (movimientos.aggregate(total=Sum('cantidad'))['total'] or 0)
+
+    def registrar_cortes(self):
+        """
+        Guarda un corte con el saldo actual de cada insumo. Los insumos se bloquean antes de
+        leer el saldo para que ningún movimiento en curso quede a medias respecto del corte.
+        """
+        with transaction.atomic():
+            saldos = list(self.select_for_update().order_by('id').values_list('id', 'cantidad_total'))
+            fecha = timezone.now()
+            return CorteInventario.objects.bulk_create([
+                CorteInventario(insumo_id=insumo_id, saldo=saldo, fecha=fecha)
+                for insumo_id, saldo in saldos
+            ])
+
+
 # Create your models here.
 class Insumo(models.Model):
     MEDIDAS = [
@@ -11,7 +106,7 @@ class Insumo(models.Model):
         ('3', 'Litro(s)'),
         ('4', 'Unidad(es)'),
     ]
-    nombre = models.CharField(max_length=255)
+    nombre = models.CharField(max_length=255)  # Único entre los activos: los insumos se resuelven por nombre
     cantidad_total = models.DecimalField(
         max_digits=10, decimal_places=2, validators=[MinValueValidator(0)],
         help_text="Cantidad total del insumo (mayor o igual a 0)."
@@ -21,6 +116,78 @@ class Insumo(models.Model):
         help_text="Cantidad disponible del insumo (mayor o igual a 0)."
     )
     unidad_medida = models.CharField(max_length=50, choices=MEDIDAS)
+    # Los insumos eliminados se conservan inactivos para no perder su libro de movimientos
+    activo = models.BooleanField(default=True)
+
+    objects = InsumoManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['nombre'], condition=models.Q(activo=True), name='insumo_nombre_activo_unico'),
+        ]
+
+    def __str__(self):
+        return self.nombre
+
+
+class MovimientoInventarioManager(models.Manager):
+    def registrar(self, ajustes, tipo, clase=None):
+        """
+        Agrega al libro un movimiento por insumo ({insumo_id: cantidad}) en un solo INSERT.
+        """
+        fecha = timezone.now()
+        return self.bulk_create([
+            self.model(insumo_id=insumo_id, tipo=tipo, cantidad=cantidad, clase=clase, fecha=fecha)
+            for insumo_id, cantidad in ajustes.items()
+            if cantidad
+        ])
+
+
+# Libro de solo inserción con cada entrada o salida de stock; Insumo.cantidad_total es su saldo materializado
+class MovimientoInventario(models.Model):
+    TIPOS = (
+        ('alta', 'Alta de insumo'),
+        ('ajuste', 'Ajuste manual'),
+        ('asignacion', 'Asignación a clase'),
+        ('devolucion', 'Devolución desde clase'),
+        ('solicitud', 'Solicitud extraordinaria aprobada'),
+        ('baja', 'Baja de insumo'),
+    )
+    # PROTECT: el libro es de solo inserción, no se borra junto con el insumo
+    insumo = models.ForeignKey(Insumo, on_delete=models.PROTECT, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)  # Positiva si entra al inventario, negativa si sale
+    clase = models.ForeignKey('subjectsApp.Clase', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_inventario')
+    fecha = models.DateTimeField(default=timezone.now)
+
+    objects = MovimientoInventarioManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['insumo', 'fecha'])]
+        verbose_name = 'Movimiento de inventario'
+        verbose_name_plural = 'Movimientos de inventario'
 
     def __str__(self):
-        return self.nombre
\ No newline at end of file
+        return f"{self.get_tipo_display()}: {self.cantidad} de {self.insumo_id}"
+
+
+# Saldo de un insumo en un instante; permite calcular saldos históricos sin recorrer todo el libro
+class CorteInventario(models.Model):
+    insumo = models.ForeignKey(Insumo, on_delete=models.PROTECT, related_name='cortes')
+    saldo = models.DecimalField(max_digits=12, decimal_places=2)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['insumo', 'fecha'])]
+        verbose_name = 'Corte de inventario'
+        verbose_name_plural = 'Cortes de inventario'
+
+    def __str__(self):
+        return f"Corte de {self.insumo_id} al {self.fecha}: {self.saldo}"
+
+
+# Signal para renovar el catálogo de insumos cuando se crea, modifica o elimina un insumo
+@receiver(post_save, sender=Insumo)
+@receiver(post_delete, sender=Insumo)
+def renovar_catalogo_insumo(sender, instance, **kwargs):
+    renovar_catalogo()
@@ -1,9 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import InsumoView
+from .views_async import insumos
 
 router = DefaultRouter()
 router.register(r'insumos', InsumoView, basename='insumo')
 # router.register(r'clase_insumos', ClaseInsumoView, basename='clase_insumo')
 # router.register(r'solicitud_insumos', SolicitudInsumoView, basename='solicitud_insumo')
 
-urlpatterns = router.urls
+# El listado se atiende con la vista async, antes que la ruta del router
+urlpatterns = [
+    path('insumos/', insumos, name='insumo-list'),
+] + router.urls
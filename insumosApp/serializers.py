@@ -1,6 +1,6 @@
 from decimal import Decimal
 from rest_framework import serializers
-from .models import Insumo
+from .models import Insumo, MovimientoInventario
 
 class InsumoSerializer(serializers.ModelSerializer):
     unidad_medida_descripcion = serializers.SerializerMethodField()
@@ -21,7 +21,15 @@ class InsumoSerializer(serializers.ModelSerializer):
 
     def get_unidad_medida_descripcion(self, obj):
         return obj.get_unidad_medida_display()
-    
+
+
+class MovimientoInventarioSerializer(serializers.ModelSerializer):
+    tipo_descripcion = serializers.CharField(source='get_tipo_display', read_only=True)
+
+    class Meta:
+        model = MovimientoInventario
+        fields = ['id', 'insumo', 'tipo', 'tipo_descripcion', 'cantidad', 'clase', 'fecha']
+
 
 # class ClaseInsumoSerializer(serializers.ModelSerializer):
 #     class Meta:
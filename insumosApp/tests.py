@@ -1,3 +1,80 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import Client, TestCase
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+from userApp.models import Usuario
+from .models import Insumo, MovimientoInventario
+from .views import InsumoEliminar
 
-# Create your tests here.
+
+class InsumoViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(
+            Usuario.objects.create_user(email="admin@test.cl", nombre="admin", password="clave", rol="1")
+        )
+        respuesta = self.cliente.post('/insumos/insumos/', {'nombre': 'ácido', 'cantidad_total': '50.00', 'unidad_medida': '3'})
+        self.insumo = Insumo.objects.get(id=respuesta.data['id'])
+
+    def test_editar_cantidad_queda_como_ajuste_sobre_el_saldo_actual(self):
+        # Una reserva posterior a la lectura del cliente no se pisa
+        Insumo.objects.ajustar_stock({self.insumo.id: Decimal("-20.00")}, 'asignacion')
+        respuesta = self.cliente.patch(f'/insumos/insumos/{self.insumo.id}/', {'cantidad_total': '40.00'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['cantidad_total'], '40.00')
+        self.assertEqual(
+            list(MovimientoInventario.objects.filter(insumo=self.insumo).order_by('id').values_list('tipo', 'cantidad')),
+            [('alta', Decimal("50.00")), ('asignacion', Decimal("-20.00")), ('ajuste', Decimal("10.00"))],
+        )
+
+    def test_editar_nombre_no_toca_el_stock(self):
+        Insumo.objects.ajustar_stock({self.insumo.id: Decimal("-20.00")}, 'asignacion')
+        respuesta = self.cliente.patch(f'/insumos/insumos/{self.insumo.id}/', {'nombre': 'ácido clorhídrico'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.insumo.refresh_from_db()
+        self.assertEqual((self.insumo.nombre, self.insumo.cantidad_total), ('ácido clorhídrico', Decimal("30.00")))
+
+    def test_eliminar_un_insumo_recien_creado_conserva_su_libro(self):
+        respuesta = self.cliente.delete(f'/insumos/insumos/{self.insumo.id}/')
+        self.assertEqual(respuesta.status_code, 204)
+        self.insumo.refresh_from_db()
+        self.assertEqual((self.insumo.activo, self.insumo.cantidad_total), (False, Decimal("0.00")))
+        self.assertEqual(
+            list(MovimientoInventario.objects.filter(insumo=self.insumo).order_by('id').values_list('tipo', 'cantidad')),
+            [('alta', Decimal("50.00")), ('baja', Decimal("-50.00"))],
+        )
+        self.assertEqual(self.cliente.get(f'/insumos/insumos/{self.insumo.id}/').status_code, 404)
+
+        # El nombre queda libre para un insumo nuevo
+        respuesta = self.cliente.post('/insumos/insumos/', {'nombre': 'ácido', 'cantidad_total': '5.00', 'unidad_medida': '3'})
+        self.assertEqual(respuesta.status_code, 201)
+        respuesta = self.cliente.post('/insumos/insumos/', {'nombre': 'ácido', 'cantidad_total': '5.00', 'unidad_medida': '3'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_eliminar_desde_la_vista_separada(self):
+        peticion = APIRequestFactory().delete(f'/insumos_e/delete/{self.insumo.id}')
+        force_authenticate(peticion, user=Usuario.objects.get(email="admin@test.cl"))
+        respuesta = InsumoEliminar.as_view()(peticion, pk=self.insumo.id)
+        self.assertEqual(respuesta.status_code, 204)
+        self.assertFalse(Insumo.objects.get(id=self.insumo.id).activo)
+
+class InsumosAsyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        usuario = Usuario.objects.create_user(email="admin@test.cl", nombre="admin", password="clave", rol="1")
+        # Cliente como el del frontend: token JWT en la cabecera y comprobación de CSRF activa
+        self.cliente = Client(
+            enforce_csrf_checks=True,
+            headers={"Authorization": f"Bearer {RefreshToken.for_user(usuario).access_token}"},
+        )
+
+    def test_crear_con_token_no_exige_csrf(self):
+        respuesta = self.cliente.post(
+            '/insumos/insumos/', {'nombre': 'ácido', 'cantidad_total': '50.00', 'unidad_medida': '3'},
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        respuesta = self.cliente.get('/insumos/insumos/')
+        self.assertEqual([insumo['nombre'] for insumo in respuesta.json()], ['ácido'])
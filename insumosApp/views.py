@@ -1,47 +1,103 @@
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import viewsets, generics
-from .models import Insumo
-from .serializers import InsumoSerializer
+from .models import Insumo, MovimientoInventario
+from .serializers import InsumoSerializer, MovimientoInventarioSerializer
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from .models import Insumo
 from subjectsApp.models import ClaseInsumo, Clase
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+def eliminar_insumo(insumo):
+    """
+    Eliminar un insumo si no está asignado a una clase iniciada. Se da de baja (queda
+    inactivo, con su libro de movimientos) en lugar de borrarse.
+    """
+    clases_iniciadas = ClaseInsumo.objects.filter(
+        insumo=insumo,
+        clase__estado="iniciada"
+    )
+
+    if clases_iniciadas.exists():
+        raise ValidationError("No se puede eliminar un insumo que está asignado a una clase iniciada.")
+
+    Insumo.objects.dar_de_baja(insumo.id)
+
 
 # CRUD para Insumo con paginación
 class InsumoView(viewsets.ModelViewSet):
-    queryset = Insumo.objects.all().order_by('nombre')  # Ordenar por el campo 'nombre'
+    queryset = Insumo.objects.activos().order_by('nombre')  # Ordenar por el campo 'nombre'
     serializer_class = InsumoSerializer
     permission_classes = [IsAuthenticated]  # Solo usuarios autenticados pueden acceder
+    orden_paginacion = ('nombre', 'id')
+
+    def perform_create(self, serializer):
+        """Crear el insumo y registrar su stock inicial en el libro de movimientos."""
+        with transaction.atomic():
+            insumo = serializer.save()
+            MovimientoInventario.objects.registrar({insumo.id: insumo.cantidad_total}, 'alta')
 
     def perform_update(self, serializer):
         """Actualizar la cantidad de un insumo si está asignado a una clase iniciada."""
-        insumo = self.get_object()
-        clases_iniciadas = ClaseInsumo.objects.filter(
-            insumo=insumo,
-            clase__estado="iniciada"
-        )
+        with transaction.atomic():
+            # Releer el insumo bloqueado: una reserva o finalización en curso no debe perderse
+            insumo = Insumo.objects.select_for_update().get(pk=self.get_object().pk)
+            clases_iniciadas = ClaseInsumo.objects.filter(
+                insumo=insumo,
+                clase__estado="iniciada"
+            )
 
-        # Verificar si se está intentando cambiar el nombre de un insumo asignado a una clase iniciada
-        if clases_iniciadas.exists() and 'nombre' in serializer.validated_data and serializer.validated_data['nombre'] != insumo.nombre:
-            raise ValidationError("No se puede modificar el nombre de un insumo que está asignado a una clase iniciada.")
-        
-        # Permitir la actualización de la cantidad total
-        serializer.save()
+            # Verificar si se está intentando cambiar el nombre de un insumo asignado a una clase iniciada
+            if clases_iniciadas.exists() and 'nombre' in serializer.validated_data and serializer.validated_data['nombre'] != insumo.nombre:
+                raise ValidationError("No se puede modificar el nombre de un insumo que está asignado a una clase iniciada.")
 
+            # La cantidad total se aplica como ajuste sobre el saldo bloqueado para dejarla en el libro;
+            # el resto de los campos se guarda sin tocar cantidad_total
+            cantidad_total = serializer.validated_data.pop('cantidad_total', None)
+            for campo, valor in serializer.validated_data.items():
+                setattr(insumo, campo, valor)
+            if serializer.validated_data:
+                insumo.save(update_fields=list(serializer.validated_data))
+            serializer.instance = insumo
+            if cantidad_total is not None:
+                Insumo.objects.ajustar_stock({insumo.id: cantidad_total - insumo.cantidad_total}, 'ajuste')
+                insumo.refresh_from_db(fields=['cantidad_total'])
 
     def perform_destroy(self, instance):
-        """Eliminar un insumo si no está asignado a una clase iniciada."""
-        clases_iniciadas = ClaseInsumo.objects.filter(
-            insumo=instance,
-            clase__estado="iniciada"
-        )
+        eliminar_insumo(instance)
 
-        if clases_iniciadas.exists():
-            raise ValidationError("No se puede eliminar un insumo que está asignado a una clase iniciada.")
+    @action(detail=True, methods=['get'], url_path='saldo')
+    def saldo(self, request, pk=None):
+        """
+        Devuelve el saldo del insumo en la fecha indicada (`?fecha=` en ISO 8601) o el saldo actual.
+        """
+        insumo = self.get_object()
+        fecha = request.query_params.get('fecha')
+        if not fecha:
+            return Response({"insumo": insumo.id, "fecha": timezone.now(), "saldo": insumo.cantidad_total})
 
-        instance.delete()
+        fecha = parse_datetime(fecha)
+        if fecha is None:
+            return Response({"error": "La fecha debe estar en formato ISO 8601."}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+
+        return Response({"insumo": insumo.id, "fecha": fecha, "saldo": Insumo.objects.saldo_al(insumo.id, fecha)})
+
+    @action(detail=True, methods=['get'], url_path='movimientos', orden_paginacion=('-fecha', '-id'))
+    def movimientos(self, request, pk=None):
+        """
+        Devuelve los movimientos de inventario del insumo, del más reciente al más antiguo.
+        """
+        insumo = self.get_object()
+        movimientos = MovimientoInventario.objects.filter(insumo=insumo)
+        serializer = MovimientoInventarioSerializer(self.paginate_queryset(movimientos), many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 # Crear un nuevo insumo (si necesitas una vista separada para esto)
@@ -50,8 +106,16 @@ class InsumoCrear(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Insumo.objects.all()
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            insumo = serializer.save()
+            MovimientoInventario.objects.registrar({insumo.id: insumo.cantidad_total}, 'alta')
+
 # Eliminar un insumo específico (si necesitas una vista separada para esto)
 class InsumoEliminar(generics.DestroyAPIView):
     serializer_class = InsumoSerializer
     permission_classes = [IsAuthenticated]
-    queryset = Insumo.objects.all()
+    queryset = Insumo.objects.activos()
+
+    def perform_destroy(self, instance):
+        eliminar_insumo(instance)
@@ -0,0 +1,31 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.utils.encoders import JSONEncoder
+from userApp.autenticacion import autenticacion_async
+from .catalogo import aobtener_catalogo
+from .views import InsumoView
+
+# Crear sigue en el viewset de DRF; el listado solo lo atiende la vista async
+insumos_drf = InsumoView.as_view({'post': 'create'})
+
+
+@autenticacion_async()
+async def _listar_insumos(request):
+    catalogo = await aobtener_catalogo()
+    return JsonResponse(catalogo['insumos'], encoder=JSONEncoder, safe=False)
+
+
+@csrf_exempt
+async def insumos(request, *args, **kwargs):
+    """
+    Listado de insumos async: devuelve el catálogo completo desde la copia en memoria
+    del proceso, sin ocupar un hilo del pool de vistas sync. Las demás peticiones se
+    atienden con InsumoView.
+
+    Exenta de CSRF como las vistas de DRF: con autenticación por sesión, DRF sigue
+    exigiendo el token CSRF dentro de InsumoView.
+    """
+    if request.method in ('GET', 'HEAD'):
+        return await _listar_insumos(request)
+    return await sync_to_async(insumos_drf)(request, *args, **kwargs)
@@ -0,0 +1,10 @@
+from django.db.models import IntegerField, Subquery
+
+
+class SubconsultaConteo(Subquery):
+    """
+    Cuenta las filas de una subconsulta correlacionada (con OuterRef) sin agrupar
+    la consulta principal, evitando que varios conteos multipliquen las filas.
+    """
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _conteo)"
+    output_field = IntegerField()
@@ -0,0 +1,178 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from insumosApp.models import MovimientoInventario
+from .models import ClaseInsumo, ClaseDistribucion, ClaseParticipacion
+from .versiones import renovar_version_clase
+from .prorrateo import repartir_matriz, cuota, cuotas_fila, a_centesimas, desde_centesimas
+
+# Tiempo máximo que se conserva la tabla de cuotas de una clase iniciada (segundos)
+DURACION_TABLA_CUOTAS = 60 * 60 * 12
+
+
+def asientos_clase(clase):
+    """
+    Asigna a cada alumno inscrito en la asignatura un asiento fijo (orden por id).
+    El asiento decide quién recibe las centésimas sobrantes del reparto.
+    """
+    alumnos_ids = clase.asignatura.alumnos.order_by('id').values_list('id', flat=True)
+    return {alumno_id: asiento for asiento, alumno_id in enumerate(alumnos_ids)}
+
+
+def distribuir_insumos(clase):
+    """
+    Distribuye insumos proporcionalmente a los alumnos que participan en la clase.
+    Los insumos no asignados permanecen en la clase.
+
+    Carga participantes e insumos una sola vez, arma la matriz completa de
+    distribuciones en memoria y la escribe con un upsert masivo, de modo que
+    el número de consultas no depende del tamaño de la clase.
+    Devuelve las cantidades asignadas a la clase antes del reparto ({insumo_id: cantidad}),
+    que son las que usa la tabla de cuotas.
+    """
+    # Obtener los insumos asignados a la clase y los participantes (una consulta cada uno)
+    insumos_asignados = list(ClaseInsumo.objects.filter(clase=clase))
+    cantidades = {insumo_asignado.insumo_id: insumo_asignado.cantidad for insumo_asignado in insumos_asignados}
+
+    # Validar que haya insumos asignados a la clase
+    if not insumos_asignados:
+        return cantidades
+
+    alumnos_ids = list(
+        ClaseParticipacion.objects.filter(clase=clase).values_list('alumno_id', flat=True)
+    )
+
+    if not alumnos_ids:
+        # Si no hay participantes, no se realiza la distribución
+        return cantidades
+
+    # Asiento de cada alumno de la asignatura
+    asientos = asientos_clase(clase)
+
+    # Evitar divisiones por cero si no hay alumnos asignados a la clase
+    if not asientos:
+        return cantidades
+
+    # Reparto exacto en centésimas de todos los insumos entre todos los asientos
+    matriz = repartir_matriz(cantidades, len(asientos))
+
+    # Participantes ordenados por asiento; quien no está inscrito queda al final con la cuota base
+    fuera_de_rango = len(asientos)
+    participantes = sorted(
+        (asientos.get(alumno_id, fuera_de_rango), alumno_id) for alumno_id in alumnos_ids
+    )
+    asientos_ordenados = [asiento for asiento, _ in participantes]
+
+    distribuciones = []
+    for insumo_asignado in insumos_asignados:
+        cuotas, cantidad_distribuida = cuotas_fila(matriz[insumo_asignado.insumo_id], asientos_ordenados)
+
+        distribuciones.extend(
+            ClaseDistribucion(
+                clase=clase,
+                alumno_id=alumno_id,
+                insumo_id=insumo_asignado.insumo_id,
+                cantidad_asignada=cantidad_asignada,
+            )
+            for (_, alumno_id), cantidad_asignada in zip(participantes, cuotas)
+        )
+
+        # La cantidad restante es exactamente lo que no se entregó a los participantes
+        restante = a_centesimas(insumo_asignado.cantidad) - cantidad_distribuida
+        insumo_asignado.cantidad = desde_centesimas(max(restante, 0))
+
+    with transaction.atomic():
+        # Un solo INSERT ... ON CONFLICT sobre la clave única (clase, alumno, insumo)
+        ClaseDistribucion.objects.bulk_create(
+            distribuciones,
+            update_conflicts=True,
+            unique_fields=['clase', 'alumno', 'insumo'],
+            update_fields=['cantidad_asignada'],
+        )
+
+        # Actualizar la cantidad restante de todos los insumos de la clase en un solo UPDATE
+        ClaseInsumo.objects.bulk_update(insumos_asignados, ['cantidad'])
+        renovar_version_clase(clase.id)
+
+    return cantidades
+
+
+def clave_tabla_cuotas(clase_id):
+    return f"subjects:clase:{clase_id}:tabla_cuotas"
+
+
+def cantidades_asignadas(clase):
+    """
+    Cantidades asignadas a la clase antes del reparto, según el libro de movimientos:
+    lo reservado para la clase menos lo devuelto. No se puede leer de ClaseInsumo,
+    que tras iniciar la clase guarda solo lo que quedó sin repartir.
+    """
+    movimientos = (
+        MovimientoInventario.objects.filter(clase=clase, tipo__in=('asignacion', 'devolucion'))
+        .values_list('insumo_id').annotate(total=Sum('cantidad')).order_by()
+    )
+    # Las asignaciones salen del inventario (negativas)
+    return {insumo_id: -total for insumo_id, total in movimientos if total}
+
+
+def construir_tabla_cuotas(clase, cantidades=None):
+    """
+    Calcula la tabla de cuotas de la clase (asiento de cada alumno y reparto de cada
+    insumo) y la deja en caché para las participaciones que lleguen mientras está iniciada.
+    `cantidades` son las asignadas a la clase, las mismas que recibió distribuir_insumos;
+    si no se indican, se reconstruyen con cantidades_asignadas.
+    """
+    if cantidades is None:
+        cantidades = cantidades_asignadas(clase)
+    asientos = asientos_clase(clase)
+    tabla = {
+        'asientos': asientos,
+        'filas': repartir_matriz(cantidades, len(asientos)),
+    }
+    # Se guarda al confirmar, para no dejar en caché una tabla de una transacción revertida
+    transaction.on_commit(lambda: cache.set(clave_tabla_cuotas(clase.id), tabla, DURACION_TABLA_CUOTAS))
+    return tabla
+
+
+def obtener_tabla_cuotas(clase):
+    tabla = cache.get(clave_tabla_cuotas(clase.id))
+    if tabla is None:
+        tabla = construir_tabla_cuotas(clase)
+    return tabla
+
+
+def invalidar_tabla_cuotas(*clases_ids):
+    cache.delete_many([clave_tabla_cuotas(clase_id) for clase_id in clases_ids])
+
+
+def registrar_participacion(clase, alumno):
+    """
+    Registra la participación de un alumno en una clase iniciada junto con sus distribuciones.
+
+    Las cuotas salen de la tabla en caché, así que cada participación solo escribe
+    la participación y un INSERT para todas sus distribuciones (ON CONFLICT DO NOTHING,
+    para que los reintentos y las llamadas simultáneas sean idempotentes).
+    Al crearse la participación, sus signals suman 1 al resumen del alumno, renuevan la
+    versión de la clase, invalidan los reportes y avisan a los clientes conectados.
+    Devuelve False si el alumno ya participaba.
+    """
+    with transaction.atomic():
+        _, creada = ClaseParticipacion.objects.get_or_create(clase=clase, alumno=alumno)
+        if not creada:
+            return False
+
+        tabla = obtener_tabla_cuotas(clase)
+        asientos = tabla['asientos']
+        asiento = asientos.get(alumno.id, len(asientos))
+
+        ClaseDistribucion.objects.bulk_create([
+            ClaseDistribucion(
+                clase=clase,
+                alumno=alumno,
+                insumo_id=insumo_id,
+                cantidad_asignada=desde_centesimas(cuota(fila, asiento)),
+            )
+            for insumo_id, fila in tabla['filas'].items()
+        ], ignore_conflicts=True)
+
+    return True
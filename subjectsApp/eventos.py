@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from django.db import transaction
+
+# Eventos pendientes que se guardan por suscriptor; si un cliente no los consume, se descartan
+MAXIMO_EVENTOS_PENDIENTES = 100
+
+# Suscripciones activas en este proceso, por canal
+_suscripciones = {}
+_bloqueo = threading.Lock()
+
+
+def canal_clase(clase_id):
+    return f"clase:{clase_id}"
+
+
+def canal_usuario(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+class Suscripcion:
+    """
+    Cola de eventos de uno o varios canales, ligada al event loop que la creó.
+    Los eventos se publican desde cualquier hilo y se entregan en ese loop.
+    """
+    def __init__(self, canales):
+        self.canales = tuple(canales)
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(MAXIMO_EVENTOS_PENDIENTES)
+
+    def _entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se pierde el evento; al reconectar vuelve a recibir el estado actual
+            pass
+
+    async def siguiente(self, espera):
+        """
+        Devuelve el siguiente evento, o None si no llega ninguno en `espera` segundos.
+        """
+        try:
+            return await asyncio.wait_for(self.cola.get(), espera)
+        except asyncio.TimeoutError:
+            return None
+
+    def cancelar(self):
+        with _bloqueo:
+            for canal in self.canales:
+                suscripciones = _suscripciones.get(canal)
+                if suscripciones is None:
+                    continue
+                suscripciones.discard(self)
+                if not suscripciones:
+                    del _suscripciones[canal]
+
+
+def suscribir(canales):
+    """
+    Crea una suscripción a los canales indicados. Debe llamarse desde código async;
+    hay que llamar a `cancelar()` cuando el cliente se desconecta.
+    """
+    suscripcion = Suscripcion(canales)
+    with _bloqueo:
+        for canal in suscripcion.canales:
+            _suscripciones.setdefault(canal, set()).add(suscripcion)
+    return suscripcion
+
+
+def hay_suscriptores(canal):
+    return canal in _suscripciones
+
+
+def publicar(canal, tipo, datos):
+    """
+    Publica un evento en el canal al confirmar la transacción, para no anunciar cambios
+    que luego se deshacen. Solo llega a los suscriptores de este proceso.
+    `datos` puede ser una función; se evalúa al confirmar y solo si hay suscriptores.
+    """
+    if not hay_suscriptores(canal):
+        return
+
+    def enviar():
+        with _bloqueo:
+            suscripciones = list(_suscripciones.get(canal, ()))
+        if not suscripciones:
+            return
+        evento = {'tipo': tipo, 'datos': datos() if callable(datos) else datos}
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, evento)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                suscripcion.cancelar()
+
+    transaction.on_commit(enviar)
+
+
+def publicar_clase(clase):
+    publicar(canal_clase(clase.id), 'clase', {'id': clase.id, 'nombre': clase.nombre, 'estado': clase.estado})
+
+
+def publicar_asistencia(clase_id):
+    from .models import ClaseParticipacion
+
+    publicar(canal_clase(clase_id), 'asistencia', lambda: {
+        'clase_id': clase_id,
+        'total_participantes': ClaseParticipacion.objects.filter(clase_id=clase_id).count(),
+    })
+
+
+def publicar_notificacion(notificacion):
+    publicar(canal_usuario(notificacion.usuario_id), 'notificacion', {
+        'id': notificacion.id,
+        'mensaje': notificacion.mensaje,
+        'leida': notificacion.leida,
+        'fecha_creacion': notificacion.fecha_creacion,
+    })
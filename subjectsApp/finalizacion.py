@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from insumosApp.models import Insumo
+from .distribucion import invalidar_tabla_cuotas
+from .notificaciones import crear_notificaciones
+from .reportes import invalidar_reporte
+from .models import (
+    Clase, ClaseInsumo, ClaseDistribucion, ClaseInsumoHistorial, ClaseAlumnoInsumoHistorial,
+    SolicitudInsumo, Notificacion,
+)
+
+MOTIVO_CLASE_FINALIZADA = "La clase ha finalizado."
+
+
+def cerrar_clase(clase):
+    """
+    Finaliza una clase, devolviendo los insumos no utilizados al inventario general
+    y registrando el historial de la clase y los insumos asignados a los alumnos.
+    Además, rechaza las solicitudes pendientes al finalizar la clase.
+
+    Todo se hace en pasos por conjunto: una agregación agrupada por insumo, inserciones
+    masivas para ambos historiales, un único UPDATE con F() para el inventario y otro
+    para las solicitudes pendientes. Devuelve un resumen de lo realizado.
+    """
+    with transaction.atomic():
+        # Bloquear la clase: dos finalizaciones simultáneas no pueden cerrarla dos veces
+        if not Clase.objects.select_for_update().filter(id=clase.id, estado="iniciada").exists():
+            raise ValueError("Solo se pueden finalizar clases en estado 'iniciada'.")
+
+        distribuciones = ClaseDistribucion.objects.filter(clase=clase)
+
+        # Registrar los insumos asignados a los alumnos
+        historial_alumnos = ClaseAlumnoInsumoHistorial.objects.bulk_create([
+            ClaseAlumnoInsumoHistorial(
+                clase=clase,
+                alumno_id=alumno_id,
+                insumo_id=insumo_id,
+                cantidad_asignada=cantidad_asignada,
+                cantidad_extra_asignada=cantidad_extra_asignada or 0,  # Asegurarnos de que no sea None
+            )
+            for alumno_id, insumo_id, cantidad_asignada, cantidad_extra_asignada in distribuciones.values_list(
+                'alumno_id', 'insumo_id', 'cantidad_asignada', 'cantidad_extra_asignada'
+            )
+        ])
+
+        # Cantidad distribuida y extra por insumo en una sola consulta agrupada
+        totales = {
+            fila['insumo']: fila
+            for fila in distribuciones.values('insumo').annotate(
+                distribuida=Sum('cantidad_asignada'),
+                extra=Sum('cantidad_extra_asignada'),
+            ).order_by()
+        }
+
+        historial = []
+        devoluciones = {}
+        for insumo_clase in ClaseInsumo.objects.filter(clase=clase):
+            total = totales.get(insumo_clase.insumo_id, {})
+            cantidad_distribuida = total.get('distribuida') or 0
+            cantidad_extra_distribuida = total.get('extra') or 0
+
+            # Cantidad no utilizada (asegurarnos de que no sea negativa)
+            cantidad_no_utilizada = max(insumo_clase.cantidad - cantidad_distribuida, 0)
+
+            historial.append(ClaseInsumoHistorial(
+                clase=clase,
+                insumo_id=insumo_clase.insumo_id,
+                cantidad_total_asignada=insumo_clase.cantidad,
+                cantidad_utilizada=cantidad_distribuida,
+                cantidad_devuelta=cantidad_no_utilizada,
+                cantidad_extra_asignada=cantidad_extra_distribuida,
+            ))
+
+            # Devolver al inventario general solo lo no utilizado
+            if cantidad_no_utilizada > 0:
+                devoluciones[insumo_clase.insumo_id] = (
+                    devoluciones.get(insumo_clase.insumo_id, 0) + cantidad_no_utilizada
+                )
+
+        # Registrar en el historial general
+        ClaseInsumoHistorial.objects.bulk_create(historial)
+        invalidar_reporte('insumos')
+        Insumo.objects.ajustar_stock(devoluciones, 'devolucion', clase=clase)
+
+        # Eliminar los insumos asignados y las distribuciones después de registrarlas en el historial
+        ClaseInsumo.objects.filter(clase=clase).delete()
+        distribuciones.delete()
+
+        # Rechazar solicitudes pendientes con un único UPDATE
+        pendientes = list(
+            SolicitudInsumo.objects.filter(clase=clase, estado="pendiente")
+            .values_list('id', 'alumno_id', 'cantidad_solicitada', 'insumo__nombre')
+        )
+        SolicitudInsumo.objects.filter(
+            id__in=[solicitud_id for solicitud_id, *_ in pendientes], estado="pendiente"
+        ).update(estado="rechazado", motivo_rechazo=MOTIVO_CLASE_FINALIZADA, actualizado_en=timezone.now())
+
+        # Crear las notificaciones para los alumnos
+        crear_notificaciones([
+            Notificacion(
+                usuario_id=alumno_id,
+                mensaje=f"Tu solicitud de {cantidad_solicitada} {insumo_nombre} ha sido rechazada porque la clase ha finalizado.",
+            )
+            for _, alumno_id, cantidad_solicitada, insumo_nombre in pendientes
+        ])
+
+        # Cambiar el estado de la clase
+        clase.estado = "finalizada"
+        clase.save()
+
+    # La tabla de cuotas solo se usa mientras la clase está iniciada
+    invalidar_tabla_cuotas(clase.id)
+
+    return {
+        "insumos_registrados": len(historial),
+        "asignaciones_registradas": len(historial_alumnos),
+        "solicitudes_rechazadas": len(pendientes),
+    }
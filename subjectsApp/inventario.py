@@ -0,0 +1,81 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from insumosApp.models import Insumo
+from .models import ClaseInsumo
+from .versiones import renovar_version_clase
+
+
+def reservar_insumos(clase, insumos_data):
+    """
+    Reserva para la clase todos los insumos solicitados ([{'insumo_id', 'cantidad'}]) de una vez.
+
+    Bloquea los insumos con un único SELECT ... FOR UPDATE ordenado por id (así dos
+    reservas simultáneas nunca se bloquean en orden cruzado), valida todo en memoria y
+    aplica los descuentos con un único UPDATE basado en F(). Si algún insumo no es válido
+    no se modifica nada y se devuelve la lista de errores.
+    """
+    errores = []
+    pedidos = {}
+    for insumo_data in insumos_data:
+        insumo_id = insumo_data.get('insumo_id')
+        cantidad = insumo_data.get('cantidad')
+
+        # Validar que insumo_id sea un número entero y cantidad sea un número positivo
+        if not isinstance(insumo_id, int) or not isinstance(cantidad, (int, float, Decimal)) or cantidad <= 0:
+            errores.append(f"Datos inválidos para insumo: {insumo_data}")
+            continue
+
+        # Convertir cantidad a Decimal (las repeticiones de un mismo insumo se suman)
+        pedidos[insumo_id] = pedidos.get(insumo_id, Decimal(0)) + Decimal(str(cantidad))
+
+    with transaction.atomic():
+        insumos = {
+            insumo.id: insumo
+            for insumo in Insumo.objects.activos().select_for_update().filter(id__in=pedidos).order_by('id')
+        }
+
+        for insumo_id, cantidad in pedidos.items():
+            insumo = insumos.get(insumo_id)
+            if insumo is None:
+                errores.append(f"Insumo con ID {insumo_id} no encontrado.")
+            elif insumo.cantidad_total < cantidad:
+                errores.append(f"Cantidad insuficiente para el insumo '{insumo.nombre}'. Disponible: {insumo.cantidad_total}. Solicitado: {cantidad}.")
+
+        if errores:
+            return errores
+
+        # Descontar del inventario general en un solo UPDATE
+        Insumo.objects.ajustar_stock(
+            {insumo_id: -cantidad for insumo_id, cantidad in pedidos.items()}, 'asignacion', clase=clase
+        )
+
+        # Actualizar los ClaseInsumo existentes y crear los que falten
+        existentes = {
+            clase_insumo.insumo_id: clase_insumo
+            for clase_insumo in ClaseInsumo.objects.filter(clase=clase, insumo_id__in=pedidos)
+        }
+        for insumo_id, clase_insumo in existentes.items():
+            clase_insumo.cantidad += pedidos[insumo_id]
+        ClaseInsumo.objects.bulk_update(existentes.values(), ['cantidad'])
+        ClaseInsumo.objects.bulk_create([
+            ClaseInsumo(clase=clase, insumo_id=insumo_id, cantidad=cantidad)
+            for insumo_id, cantidad in pedidos.items()
+            if insumo_id not in existentes
+        ])
+        renovar_version_clase(clase.id)
+
+    return errores
+
+
+def devolver_insumos(asignados, clase=None):
+    """
+    Devuelve al inventario general todo lo asignado en los ClaseInsumo indicados y los elimina.
+    Las cantidades se agrupan por insumo y se reponen con un único UPDATE.
+    """
+    with transaction.atomic():
+        devoluciones = dict(
+            asignados.values('insumo').annotate(total=Sum('cantidad')).order_by().values_list('insumo', 'total')
+        )
+        Insumo.objects.ajustar_stock(devoluciones, 'devolucion', clase=clase)
+        asignados.delete()
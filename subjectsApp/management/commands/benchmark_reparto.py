@@ -0,0 +1,73 @@
+from decimal import Decimal
+from random import Random
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from subjectsApp.prorrateo import repartir_matriz, cuotas_fila, a_centesimas
+
+
+def reparto_por_fila(cantidades, total_alumnos):
+    """
+    Reparto anterior: cada alumno recibe round(cantidad / total_alumnos, 2), calculado
+    alumno por alumno con Decimal. Devuelve la suma entregada de cada insumo.
+    """
+    entregado = {}
+    for insumo_id, cantidad in cantidades.items():
+        cantidad_por_alumno = cantidad / Decimal(total_alumnos)
+        suma = Decimal(0)
+        for _ in range(total_alumnos):
+            suma += round(cantidad_por_alumno, 2)
+        entregado[insumo_id] = suma
+    return entregado
+
+
+def reparto_por_matriz(cantidades, total_alumnos):
+    """
+    Reparto actual (prorrateo): toda la matriz de una vez en centésimas enteras.
+    Devuelve la suma entregada de cada insumo, en centésimas.
+    """
+    asientos = list(range(total_alumnos))
+    return {
+        insumo_id: cuotas_fila(fila, asientos)[1]
+        for insumo_id, fila in repartir_matriz(cantidades, total_alumnos).items()
+    }
+
+
+class Command(BaseCommand):
+    help = "Compara el reparto anterior (Decimal por alumno) con el de prorrateo, sin usar la base de datos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alumnos', type=int, nargs='+', default=[10000, 50000], help="Tamaños de clase a medir.")
+        parser.add_argument('--insumos', type=int, default=15, help="Insumos asignados a la clase.")
+        parser.add_argument('--repeticiones', type=int, default=3, help="Se informa el mejor tiempo de estas repeticiones.")
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def _medir(self, funcion, repeticiones, *args):
+        mejor = None
+        for _ in range(repeticiones):
+            inicio = perf_counter()
+            resultado = funcion(*args)
+            duracion = perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        return mejor, resultado
+
+    def handle(self, *args, **options):
+        azar = Random(options['semilla'])
+        cantidades = {
+            insumo_id: Decimal(azar.randint(100, 10_000_000)).scaleb(-2)
+            for insumo_id in range(options['insumos'])
+        }
+
+        for total_alumnos in options['alumnos']:
+            t_fila, por_fila = self._medir(reparto_por_fila, options['repeticiones'], cantidades, total_alumnos)
+            t_matriz, por_matriz = self._medir(reparto_por_matriz, options['repeticiones'], cantidades, total_alumnos)
+
+            # Centésimas que el reparto anterior pierde o entrega de más; el actual siempre cuadra
+            desvio_fila = sum(abs(a_centesimas(por_fila[i]) - a_centesimas(c)) for i, c in cantidades.items())
+            desvio_matriz = sum(abs(por_matriz[i] - a_centesimas(c)) for i, c in cantidades.items())
+
+            self.stdout.write(
+                f"{total_alumnos} alumnos x {options['insumos']} insumos: "
+                f"por fila {t_fila * 1000:.1f} ms (desvío {desvio_fila} centésimas), "
+                f"prorrateo {t_matriz * 1000:.1f} ms (desvío {desvio_matriz} centésimas), "
+                f"{t_fila / t_matriz:.1f}x"
+            )
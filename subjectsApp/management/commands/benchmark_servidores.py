@@ -0,0 +1,106 @@
+import asyncio
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import RefreshToken
+from userApp.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el rendimiento de las rutas de lectura atendidas por WSGI (un hilo por petición) "
+        "y por ASGI (vistas async). Sin --url mide los handlers de Django en el mismo proceso; "
+        "con --url mide servidores en ejecución (por ejemplo, uvicorn y gunicorn) por HTTP."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', required=True, help="Usuario con el que se firma el token JWT.")
+        parser.add_argument('--rutas', nargs='+', default=['/insumos/insumos/'], help="Rutas GET a medir.")
+        parser.add_argument('--peticiones', type=int, default=500, help="Peticiones por ruta y servidor.")
+        parser.add_argument('--concurrencia', type=int, default=32, help="Peticiones en curso a la vez.")
+        parser.add_argument('--url', nargs='*', default=[], help="URL base de cada servidor a medir por HTTP.")
+
+    def handle(self, *args, **options):
+        try:
+            usuario = Usuario.objects.get(email=options['email'])
+        except Usuario.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['email']}.")
+        cabeceras = {'Authorization': f"Bearer {RefreshToken.for_user(usuario).access_token}"}
+        peticiones, concurrencia = options['peticiones'], options['concurrencia']
+
+        for ruta in options['rutas']:
+            if options['url']:
+                for url in options['url']:
+                    medicion = self._medir_http(url.rstrip('/') + ruta, cabeceras, peticiones, concurrencia)
+                    self._informar(f"{url} {ruta}", medicion)
+            else:
+                self._informar(f"wsgi {ruta}", self._medir_wsgi(ruta, cabeceras, peticiones, concurrencia))
+                self._informar(f"asgi {ruta}", asyncio.run(self._medir_asgi(ruta, cabeceras, peticiones, concurrencia)))
+
+    def _medir_wsgi(self, ruta, cabeceras, peticiones, concurrencia):
+        # Como un servidor WSGI con `concurrencia` hilos
+        def pedir(_):
+            try:
+                inicio = perf_counter()
+                respuesta = Client().get(ruta, headers=cabeceras)
+                return perf_counter() - inicio, respuesta.status_code
+            finally:
+                connections.close_all()
+
+        inicio = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+            resultados = list(ejecutor.map(pedir, range(peticiones)))
+        return perf_counter() - inicio, resultados
+
+    async def _medir_asgi(self, ruta, cabeceras, peticiones, concurrencia):
+        # Como un servidor ASGI: un solo hilo de eventos con `concurrencia` peticiones en curso
+        pendientes = iter(range(peticiones))
+        resultados = []
+
+        async def trabajador():
+            cliente = AsyncClient()
+            for _ in pendientes:
+                inicio = perf_counter()
+                respuesta = await cliente.get(ruta, headers=cabeceras)
+                resultados.append((perf_counter() - inicio, respuesta.status_code))
+
+        inicio = perf_counter()
+        try:
+            await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        finally:
+            # El ORM de las vistas corre en el hilo compartido de sync_to_async; cerrar
+            # allí las conexiones que abrió (el cliente de pruebas no las cierra)
+            await sync_to_async(connections.close_all)()
+        return perf_counter() - inicio, resultados
+
+    def _medir_http(self, url, cabeceras, peticiones, concurrencia):
+        def pedir(_):
+            inicio = perf_counter()
+            try:
+                with urlopen(Request(url, headers=cabeceras)) as respuesta:
+                    respuesta.read()
+                    estado = respuesta.status
+            except HTTPError as error:
+                estado = error.code
+            return perf_counter() - inicio, estado
+
+        inicio = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+            resultados = list(ejecutor.map(pedir, range(peticiones)))
+        return perf_counter() - inicio, resultados
+
+    def _informar(self, nombre, medicion):
+        duracion, resultados = medicion
+        latencias = sorted(latencia * 1000 for latencia, _ in resultados)
+        cuantiles = statistics.quantiles(latencias, n=20) if len(latencias) > 1 else latencias * 19
+        errores = sum(1 for _, estado in resultados if estado >= 400)
+        self.stdout.write(
+            f"{nombre}: {len(resultados)} peticiones en {duracion:.2f} s, {len(resultados) / duracion:.0f} req/s, "
+            f"p50 {statistics.median(latencias):.1f} ms, p95 {cuantiles[18]:.1f} ms, {errores} errores"
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from subjectsApp.reportes import REPORTES, estadisticas_reportes, invalidar_reporte, reiniciar_estadisticas_reportes
+
+
+class Command(BaseCommand):
+    help = (
+        "Muestra los aciertos y fallos de la caché de reportes; opcionalmente los reinicia o invalida los reportes. "
+        "Los contadores son exactos con Redis (REDIS_URL); con la caché en archivos y varios procesos son aproximados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help="Reiniciar los contadores después de mostrarlos.")
+        parser.add_argument('--invalidar', action='store_true', help="Invalidar todos los reportes en caché.")
+
+    def handle(self, *args, **options):
+        for reporte, contadores in estadisticas_reportes().items():
+            total = contadores['aciertos'] + contadores['fallos']
+            tasa = (contadores['aciertos'] / total) * 100 if total else 0
+            self.stdout.write(
+                f"{reporte}: {contadores['aciertos']} aciertos, {contadores['fallos']} fallos ({tasa:.1f}% de aciertos)"
+            )
+
+        if options['reiniciar']:
+            reiniciar_estadisticas_reportes()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados."))
+        if options['invalidar']:
+            for reporte in REPORTES:
+                invalidar_reporte(reporte)
+            self.stdout.write(self.style.SUCCESS("Reportes invalidados."))
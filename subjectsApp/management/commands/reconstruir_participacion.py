@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from subjectsApp.models import ParticipacionResumen
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los resúmenes de participación (ParticipacionResumen) a partir de las participaciones registradas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asignatura', type=int, action='append', help="Limitar a una o más asignaturas (por id).")
+
+    def handle(self, *args, **options):
+        resumenes = ParticipacionResumen.objects.reconstruir(asignatura_ids=options['asignatura'])
+        self.stdout.write(self.style.SUCCESS(f"Se reconstruyeron {len(resumenes)} resúmenes de participación."))
@@ -1,12 +1,47 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from userApp.models import Usuario
 from django.conf import settings # Importa el modelo de usuario
-from django.db.models.signals import post_save, post_delete
+from django.db.models import F, OuterRef, Exists, Prefetch, Value
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from insumosApp.models import Insumo
+from .consultas import SubconsultaConteo
+from .versiones import renovar_version_clase, renovar_version_notificaciones
+from .notificaciones import ajustar_no_leidas, descartar_no_leidas
+from .eventos import publicar_clase, publicar_asistencia, publicar_notificacion
+from .reportes import invalidar_reporte
 
 # Create your models here.
 
+def _pide(campos, *nombres):
+    # Sin selección de campos se preparan todos
+    return campos is None or any(nombre in campos for nombre in nombres)
+
+
+class AsignaturaQuerySet(models.QuerySet):
+    def con_detalle(self, campos=None, expandidos=()):
+        """
+        Prepara las asignaturas para AsignaturaSerializer: trae al profesor en la misma
+        consulta, anota la cantidad de alumnos y precarga a los alumnos (solo nombre y email).
+        Si se indican `campos`, solo se prepara lo que esos campos leen.
+        """
+        queryset = self
+        if _pide(campos, 'profesor_nombre') or 'profesor' in expandidos:
+            queryset = queryset.select_related('profesor')
+        if _pide(campos, 'cantidad_alumnos'):
+            queryset = queryset.annotate(
+                total_alumnos=SubconsultaConteo(
+                    Asignatura.alumnos.through.objects.filter(asignatura_id=OuterRef('pk')).values('id')
+                ),
+            )
+        if _pide(campos, 'alumnos_nombres', 'alumnos_email'):
+            queryset = queryset.prefetch_related(
+                Prefetch('alumnos', queryset=Usuario.objects.only('id', 'nombre', 'email'))
+            )
+        return queryset
+
+
 class Asignatura(models.Model):
     nombre = models.CharField(max_length=255)
     numero_clases = models.IntegerField(default=0)
@@ -24,11 +59,50 @@ class Asignatura(models.Model):
         related_name='asignaturas_cursadas'
     )
 
+    objects = AsignaturaQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.nombre} - {self.profesor}"
 
 
 
+class ClaseQuerySet(models.QuerySet):
+    def con_detalle(self, usuario=None, campos=None, expandidos=()):
+        """
+        Prepara las clases para ClaseSerializer: anota los conteos de asistencia y si
+        `usuario` (alumno) ya participa, y precarga insumos, distribuciones e historial,
+        de modo que listar muchas clases cueste un número fijo de consultas.
+        Si se indican `campos`, solo se prepara lo que esos campos leen.
+        """
+        queryset = self
+        if _pide(campos, 'ya_participa'):
+            if usuario is not None and usuario.is_authenticated and usuario.rol == "3":
+                ya_participa = Exists(ClaseParticipacion.objects.filter(clase=OuterRef('pk'), alumno=usuario))
+            else:
+                ya_participa = Value(False)
+            queryset = queryset.annotate(usuario_participa=ya_participa)
+        if _pide(campos, 'asistencia'):
+            queryset = queryset.annotate(
+                total_participantes=SubconsultaConteo(
+                    ClaseParticipacion.objects.filter(clase=OuterRef('pk')).values('id')
+                ),
+                total_inscritos=SubconsultaConteo(
+                    Asignatura.alumnos.through.objects.filter(asignatura_id=OuterRef('asignatura_id')).values('id')
+                ),
+            )
+        if 'asignatura' in expandidos:
+            queryset = queryset.select_related('asignatura')
+
+        precargas = {
+            'insumos': Prefetch('claseinsumo_set', queryset=ClaseInsumo.objects.select_related('insumo')),
+            'distribuciones': Prefetch('distribuciones', queryset=ClaseDistribucion.objects.select_related('alumno', 'insumo')),
+            'historial_insumos': Prefetch('insumos_historial', queryset=ClaseInsumoHistorial.objects.select_related('insumo')),
+        }
+        return queryset.prefetch_related(
+            *[precarga for campo, precarga in precargas.items() if _pide(campos, campo)]
+        )
+
+
 class Clase(models.Model):
     ESTADOS = (
         ('pendiente', 'Pendiente'),
@@ -47,6 +121,14 @@ class Clase(models.Model):
     insumos_asignados = models.BooleanField(default=False)
     insumos = models.ManyToManyField(Insumo, through='ClaseInsumo')  # Nueva relación
 
+    objects = ClaseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Clases de una asignatura en un estado (por ejemplo, las iniciadas)
+            models.Index(fields=['asignatura', 'estado'], name='clase_asignatura_estado_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -66,6 +148,10 @@ class ClaseDistribucion(models.Model):
 
     class Meta:
         unique_together = ('clase', 'alumno', 'insumo')
+        indexes = [
+            # Cantidad repartida por insumo de una clase (insumos_asignados)
+            models.Index(fields=['clase', 'insumo'], name='distribucion_clase_insumo_idx'),
+        ]
         verbose_name = 'Distribución de insumos'
         verbose_name_plural = 'Distribuciones de insumos'
 
@@ -109,12 +195,40 @@ class ClaseAlumnoInsumoHistorial(models.Model):
     
 
     class Meta:
+        indexes = [
+            # Historial de un alumno en una clase (historial_alumno_insumos)
+            models.Index(fields=['clase', 'alumno'], name='historial_clase_alumno_idx'),
+        ]
         verbose_name = "Historial de insumos asignados al alumno"
         verbose_name_plural = "Historial de insumos asignados a los alumnos"
 
     def __str__(self):
         return f"{self.alumno.username} - {self.insumo.nombre} ({self.cantidad_asignada})"
 
+class SolicitudInsumoManager(models.Manager):
+    def transicionar(self, solicitud_id, desde, hacia, **campos):
+        """
+        Cambia el estado de una solicitud de `desde` a `hacia` con un único
+        UPDATE ... WHERE id = ? AND estado = ?, junto con los `campos` indicados.
+        Devuelve False si la solicitud ya no estaba en `desde` (por ejemplo, porque otro
+        usuario la gestionó al mismo tiempo); así solo una de dos gestiones simultáneas avanza.
+        """
+        return bool(self.transicionar_lote([solicitud_id], desde, hacia, **campos))
+
+    def transicionar_lote(self, solicitudes_ids, desde, hacia, **campos):
+        """
+        Igual que transicionar, para varias solicitudes en un solo UPDATE.
+        Devuelve cuántas estaban en `desde` y cambiaron de estado.
+        """
+        if hacia not in self.model.TRANSICIONES.get(desde, ()):
+            raise ValueError(f"Transición de solicitud no permitida: {desde} -> {hacia}.")
+        if not solicitudes_ids:
+            return 0
+        return self.filter(id__in=solicitudes_ids, estado=desde).update(
+            estado=hacia, actualizado_en=timezone.now(), **campos
+        )
+
+
 class SolicitudInsumo(models.Model):
     ESTADOS = (
         ('pendiente', 'Pendiente'),
@@ -122,6 +236,11 @@ class SolicitudInsumo(models.Model):
         ('aprobado', 'Aprobado'),
         ('rechazado', 'Rechazado'),
     )
+    # Estados a los que se puede pasar desde cada estado; 'aprobado' y 'rechazado' son finales
+    TRANSICIONES = {
+        'pendiente': ('pendiente_admin', 'rechazado'),  # Gestión del profesor
+        'pendiente_admin': ('aprobado', 'rechazado'),  # Gestión del administrador
+    }
     alumno = models.ForeignKey(Usuario, on_delete=models.CASCADE, limit_choices_to={'rol': '3'})
     clase = models.ForeignKey(Clase, on_delete=models.CASCADE)
     insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE)
@@ -134,6 +253,20 @@ class SolicitudInsumo(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = SolicitudInsumoManager()
+
+    class Meta:
+        indexes = [
+            # Bandejas del profesor y del administrador (estado y tipo de solicitud)
+            models.Index(fields=['estado', 'es_extra'], name='solicitud_estado_extra_idx'),
+            # Solicitudes pendientes de una clase (al finalizarla)
+            models.Index(fields=['clase', 'estado'], name='solicitud_clase_estado_idx'),
+            # Historial del alumno, del más reciente al más antiguo
+            models.Index(fields=['alumno', '-creado_en'], name='solicitud_alumno_fecha_idx'),
+            # Orden de la paginación por cursor
+            models.Index(fields=['-creado_en', '-id'], name='solicitud_fecha_id_idx'),
+        ]
+
     def __str__(self):
         return f"Solicitud de {self.alumno.nombre} para {self.insumo.nombre} ({self.estado})"
 
@@ -149,34 +282,307 @@ class Notificacion(models.Model):
 
     class Meta:
         ordering = ['-fecha_creacion']  # Las notificaciones más recientes primero
+        indexes = [
+            # Notificaciones del usuario en el orden de la paginación por cursor
+            models.Index(fields=['usuario', '-fecha_creacion', '-id'], name='notificacion_usuario_fecha_idx'),
+            # Solo las no leídas, para contarlas y marcarlas sin recorrer las leídas
+            models.Index(fields=['usuario'], condition=models.Q(leida=False), name='notificacion_no_leida_idx'),
+        ]
 
     def __str__(self):
         return f"Notificación para {self.usuario.username}: {self.mensaje[:30]}..."
 
+class ParticipacionResumenManager(models.Manager):
+    def reconstruir(self, asignatura_ids=None, alumno_ids=None):
+        """
+        Recalcula desde cero los resúmenes de las inscripciones indicadas (todas si no se filtra)
+        con una sola consulta sobre la tabla de inscripciones y los vuelve a insertar en bloque.
+        """
+        inscripciones = Asignatura.alumnos.through.objects.all()
+        resumenes = self.all()
+        if asignatura_ids is not None:
+            inscripciones = inscripciones.filter(asignatura_id__in=asignatura_ids)
+            resumenes = resumenes.filter(asignatura_id__in=asignatura_ids)
+        if alumno_ids is not None:
+            inscripciones = inscripciones.filter(usuario_id__in=alumno_ids)
+            resumenes = resumenes.filter(alumno_id__in=alumno_ids)
+
+        filas = inscripciones.annotate(
+            participadas=SubconsultaConteo(
+                ClaseParticipacion.objects.filter(
+                    clase__asignatura=OuterRef('asignatura_id'), alumno=OuterRef('usuario_id')
+                ).values('id')
+            ),
+            total=SubconsultaConteo(
+                Clase.objects.filter(asignatura=OuterRef('asignatura_id')).values('id')
+            ),
+        ).values_list('asignatura_id', 'usuario_id', 'participadas', 'total')
+
+        # Los reportes de participación se leen de estos resúmenes
+        invalidar_reporte('participacion_general')
+        invalidar_reporte('participacion_alumno', *(alumno_ids if alumno_ids is not None else ()))
+
+        with transaction.atomic():
+            resumenes.delete()
+            return self.bulk_create(
+                [
+                    self.model(asignatura_id=asignatura_id, alumno_id=alumno_id, clases_participadas=participadas, total_clases=total)
+                    for asignatura_id, alumno_id, participadas, total in filas.iterator(chunk_size=2000)
+                ],
+                batch_size=1000,
+            )
+
+
+# Resumen de participación por alumno y asignatura, mantenido por signals para que los reportes no recuenten
+class ParticipacionResumen(models.Model):
+    asignatura = models.ForeignKey(Asignatura, on_delete=models.CASCADE, related_name='resumenes_participacion')
+    alumno = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='resumenes_participacion')
+    clases_participadas = models.PositiveIntegerField(default=0)
+    total_clases = models.PositiveIntegerField(default=0)
+
+    objects = ParticipacionResumenManager()
+
+    class Meta:
+        unique_together = ('asignatura', 'alumno')
+        verbose_name = 'Resumen de participación'
+        verbose_name_plural = 'Resúmenes de participación'
+
+    def __str__(self):
+        return f"{self.alumno_id} en {self.asignatura_id}: {self.clases_participadas}/{self.total_clases}"
+
+# Trabajo en segundo plano (por ejemplo, finalizar una clase) cuyo avance se consulta por id
+class Tarea(models.Model):
+    TIPOS = (
+        ('finalizar_clase', 'Finalizar clase'),
+    )
+    ESTADOS = (
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    )
+    tipo = models.CharField(max_length=30, choices=TIPOS)
+    clase = models.ForeignKey(Clase, on_delete=models.CASCADE, null=True, blank=True, related_name='tareas')
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='tareas')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Tarea {self.id} ({self.tipo}): {self.estado}"
+
 @receiver(post_save, sender=Asignatura)
 def crear_clases(sender, instance, created, **kwargs):
-    if created:
-        for i in range(instance.numero_clases):
-            Clase.objects.create(
+    if created and instance.numero_clases:
+        # Un solo INSERT para todas las clases. bulk_create no dispara los signals de Clase,
+        # pero no hacen falta: `numero_clases` ya es el correcto y una asignatura recién creada
+        # no tiene inscritos, resúmenes, versiones ni suscriptores que actualizar
+        Clase.objects.bulk_create([
+            Clase(
                 asignatura=instance,
                 profesor=instance.profesor,
                 nombre=f"Clase {i + 1}"
             )
+            for i in range(instance.numero_clases)
+        ])
 
-# Signal para actualizar el número de clases en Asignatura cuando se crea o actualiza una Clase
+# Signal para sumar una clase al número de clases de la Asignatura cuando se crea una Clase
 @receiver(post_save, sender=Clase)
-def actualizar_numero_clases_post_save(sender, instance, **kwargs):
-    asignatura = instance.asignatura
-    asignatura.numero_clases = asignatura.clase_set.count()
-    asignatura.save()
+def actualizar_numero_clases_post_save(sender, instance, created, **kwargs):
+    if created:
+        Asignatura.objects.filter(id=instance.asignatura_id).update(numero_clases=F('numero_clases') + 1)
 
 
-# Signal para actualizar el número de clases en Asignatura cuando se elimina una Clase
+# Signal para restar una clase al número de clases de la Asignatura cuando se elimina una Clase
 @receiver(post_delete, sender=Clase)
 def actualizar_numero_clases_post_delete(sender, instance, **kwargs):
-    asignatura = instance.asignatura
-    asignatura.numero_clases = asignatura.clase_set.count()
-    asignatura.save()
+    Asignatura.objects.filter(id=instance.asignatura_id, numero_clases__gt=0).update(numero_clases=F('numero_clases') - 1)
+
+
+# Signal para descartar las tablas de cuotas de las clases iniciadas cuando cambian los alumnos inscritos
+@receiver(m2m_changed, sender=Asignatura.alumnos.through)
+def invalidar_cuotas_inscripcion(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    from .distribucion import invalidar_tabla_cuotas
+
+    if not reverse:
+        clases = Clase.objects.filter(asignatura=instance, estado="iniciada")
+    elif pk_set:
+        clases = Clase.objects.filter(asignatura_id__in=pk_set, estado="iniciada")
+    else:
+        # Se están quitando todas las asignaturas de un alumno
+        clases = Clase.objects.filter(asignatura__alumnos=instance, estado="iniciada")
+    invalidar_tabla_cuotas(*clases.values_list("id", flat=True))
+
+
+# Signals que mantienen ParticipacionResumen de forma incremental
+@receiver(post_save, sender=ClaseParticipacion)
+def sumar_participacion_resumen(sender, instance, created, **kwargs):
+    if created:
+        ParticipacionResumen.objects.filter(
+            asignatura__clase__id=instance.clase_id, alumno_id=instance.alumno_id
+        ).update(clases_participadas=F('clases_participadas') + 1)
+
+
+@receiver(post_delete, sender=ClaseParticipacion)
+def restar_participacion_resumen(sender, instance, **kwargs):
+    ParticipacionResumen.objects.filter(
+        asignatura__clase__id=instance.clase_id, alumno_id=instance.alumno_id, clases_participadas__gt=0
+    ).update(clases_participadas=F('clases_participadas') - 1)
+
+
+@receiver(post_save, sender=Clase)
+def sumar_clase_resumen(sender, instance, created, **kwargs):
+    if created:
+        ParticipacionResumen.objects.filter(asignatura_id=instance.asignatura_id).update(total_clases=F('total_clases') + 1)
+
+
+@receiver(post_delete, sender=Clase)
+def restar_clase_resumen(sender, instance, **kwargs):
+    ParticipacionResumen.objects.filter(asignatura_id=instance.asignatura_id, total_clases__gt=0).update(total_clases=F('total_clases') - 1)
+
+
+@receiver(m2m_changed, sender=Asignatura.alumnos.through)
+def actualizar_inscripcion_resumen(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add":
+        if reverse:
+            ParticipacionResumen.objects.reconstruir(asignatura_ids=pk_set, alumno_ids=[instance.pk])
+        else:
+            ParticipacionResumen.objects.reconstruir(asignatura_ids=[instance.pk], alumno_ids=pk_set)
+    elif action == "post_remove":
+        if reverse:
+            ParticipacionResumen.objects.filter(alumno_id=instance.pk, asignatura_id__in=pk_set).delete()
+        else:
+            ParticipacionResumen.objects.filter(asignatura_id=instance.pk, alumno_id__in=pk_set).delete()
+    elif action == "post_clear":
+        if reverse:
+            ParticipacionResumen.objects.filter(alumno_id=instance.pk).delete()
+        else:
+            ParticipacionResumen.objects.filter(asignatura_id=instance.pk).delete()
+
+
+# Signals que renuevan la versión (ETag) de las clases y de las notificaciones de cada usuario
+@receiver(post_save, sender=Clase)
+@receiver(post_delete, sender=Clase)
+def renovar_version_de_clase(sender, instance, **kwargs):
+    renovar_version_clase(instance.id)
+
+
+@receiver(post_save, sender=ClaseParticipacion)
+@receiver(post_delete, sender=ClaseParticipacion)
+@receiver(post_save, sender=ClaseDistribucion)
+@receiver(post_delete, sender=ClaseDistribucion)
+@receiver(post_save, sender=ClaseInsumo)
+@receiver(post_delete, sender=ClaseInsumo)
+def renovar_version_de_clase_relacionada(sender, instance, **kwargs):
+    renovar_version_clase(instance.clase_id)
+
+
+# Sin receptor de post_delete: así los borrados de notificaciones son un solo DELETE.
+# Las vistas eliminan con notificaciones.eliminar_notificaciones, que ajusta versión y contador.
+@receiver(post_save, sender=Notificacion)
+def renovar_version_de_notificaciones(sender, instance, created, **kwargs):
+    renovar_version_notificaciones(instance.usuario_id)
+    if created:
+        ajustar_no_leidas({instance.usuario_id: 0 if instance.leida else 1})
+    else:
+        # No se sabe si cambió `leida`
+        descartar_no_leidas(instance.usuario_id)
+
+
+# Signals que publican los cambios para los clientes conectados al stream de eventos
+@receiver(post_save, sender=Clase)
+def publicar_cambio_clase(sender, instance, **kwargs):
+    publicar_clase(instance)
 
 
+@receiver(post_save, sender=ClaseParticipacion)
+@receiver(post_delete, sender=ClaseParticipacion)
+def publicar_cambio_asistencia(sender, instance, **kwargs):
+    publicar_asistencia(instance.clase_id)
 
+
+@receiver(post_save, sender=Notificacion)
+def publicar_nueva_notificacion(sender, instance, created, **kwargs):
+    if created:
+        publicar_notificacion(instance)
+
+
+@receiver(m2m_changed, sender=Asignatura.alumnos.through)
+def renovar_version_inscripcion(sender, instance, action, reverse, pk_set, **kwargs):
+    # La asistencia de las clases depende de los alumnos inscritos
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        clases = Clase.objects.filter(asignatura=instance)
+    elif pk_set:
+        clases = Clase.objects.filter(asignatura_id__in=pk_set)
+    else:
+        clases = Clase.objects.filter(asignatura__alumnos=instance)
+    renovar_version_clase(*clases.values_list("id", flat=True))
+
+
+# Signals que invalidan los reportes en caché cuando cambian sus datos de origen
+def invalidar_reportes_participacion(asignaturas_ids=(), alumnos_ids=None):
+    """
+    Invalida los reportes de participación de las asignaturas indicadas y el general.
+    El reporte por alumno se invalida para `alumnos_ids` o completo si no se indican.
+    """
+    if asignaturas_ids:
+        invalidar_reporte('participacion', *asignaturas_ids)
+    invalidar_reporte('participacion_general')
+    invalidar_reporte('participacion_alumno', *(alumnos_ids or ()))
+
+
+@receiver(post_save, sender=ClaseParticipacion)
+@receiver(post_delete, sender=ClaseParticipacion)
+def invalidar_reportes_participacion_clase(sender, instance, **kwargs):
+    asignatura_id = Clase.objects.filter(id=instance.clase_id).values_list('asignatura_id', flat=True).first()
+    invalidar_reportes_participacion([asignatura_id] if asignatura_id else (), [instance.alumno_id])
+
+
+@receiver(post_save, sender=Clase)
+@receiver(post_delete, sender=Clase)
+def invalidar_reportes_clase(sender, instance, **kwargs):
+    invalidar_reportes_participacion([instance.asignatura_id])
+    invalidar_reporte('insumos')
+
+
+@receiver(post_save, sender=Asignatura)
+@receiver(post_delete, sender=Asignatura)
+def invalidar_reportes_asignatura(sender, instance, **kwargs):
+    invalidar_reportes_participacion([instance.id])
+    invalidar_reporte('insumos')
+
+
+@receiver(m2m_changed, sender=Asignatura.alumnos.through)
+def invalidar_reportes_inscripcion(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        if pk_set is None:
+            # Se quitaron todas las asignaturas del alumno
+            invalidar_reporte('participacion')
+        invalidar_reportes_participacion(pk_set or (), [instance.pk])
+    else:
+        invalidar_reportes_participacion([instance.pk], pk_set or None)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_reportes_usuario(sender, instance, **kwargs):
+    # Los reportes muestran nombres y correos de alumnos y profesores
+    invalidar_reporte('participacion')
+    invalidar_reporte('participacion_general')
+
+
+@receiver(post_save, sender=ClaseInsumoHistorial)
+@receiver(post_delete, sender=ClaseInsumoHistorial)
+@receiver(post_save, sender=Insumo)
+@receiver(post_delete, sender=Insumo)
+def invalidar_reporte_insumos(sender, instance, **kwargs):
+    invalidar_reporte('insumos')
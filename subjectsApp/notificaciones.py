@@ -0,0 +1,143 @@
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from .versiones import renovar_version_notificaciones
+from .eventos import publicar_notificacion
+
+# Vida máxima del contador de no leídas en caché (segundos); acota cualquier desvío
+DURACION_CONTADOR_NO_LEIDAS = 60 * 10
+
+# Máximo de notificaciones que se eliminan en un mismo lote
+MAXIMO_LOTE_NOTIFICACIONES = 1000
+
+
+def clave_no_leidas(usuario_id):
+    return f"subjects:usuario:{usuario_id}:notificaciones:no_leidas"
+
+
+def no_leidas(usuario_id):
+    """
+    Devuelve cuántas notificaciones sin leer tiene el usuario. El contador vive en la caché
+    y se ajusta con cada cambio; si no está, se cuenta una vez sobre el índice parcial de no leídas.
+    """
+    from .models import Notificacion
+
+    total = cache.get(clave_no_leidas(usuario_id))
+    if total is None:
+        total = Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+        cache.add(clave_no_leidas(usuario_id), total, DURACION_CONTADOR_NO_LEIDAS)
+    return total
+
+
+def _incremento_atomico():
+    # Solo Redis incrementa de forma atómica; en la caché en archivos incr es leer y escribir,
+    # y dos procesos que ajustan el mismo contador a la vez pueden perder un ajuste
+    return isinstance(caches['default'], RedisCache)
+
+
+def ajustar_no_leidas(ajustes):
+    """
+    Suma a los contadores en caché la cantidad indicada para cada usuario ({usuario_id: cantidad})
+    al confirmar la transacción. Los contadores que no están en caché se dejan así:
+    se contarán la próxima vez que se consulten. Sin Redis los contadores no se ajustan
+    sino que se descartan, para no acumular desvíos entre procesos.
+    """
+    ajustes = {usuario_id: cantidad for usuario_id, cantidad in ajustes.items() if cantidad}
+    if not ajustes:
+        return
+    if not _incremento_atomico():
+        descartar_no_leidas(*ajustes)
+        return
+
+    def aplicar():
+        for usuario_id, cantidad in ajustes.items():
+            try:
+                cache.incr(clave_no_leidas(usuario_id), cantidad)
+            except ValueError:
+                pass
+
+    transaction.on_commit(aplicar)
+
+
+def descartar_no_leidas(*usuarios_ids):
+    """
+    Descarta los contadores en caché al confirmar la transacción, cuando no se sabe
+    cuánto cambiaron (por ejemplo, al guardar una notificación existente).
+    """
+    claves = [clave_no_leidas(usuario_id) for usuario_id in usuarios_ids]
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def crear_notificaciones(notificaciones):
+    """
+    Guarda las notificaciones (instancias sin guardar) con un solo INSERT y actualiza
+    la versión y el contador de no leídas de cada destinatario.
+    """
+    from .models import Notificacion
+
+    if not notificaciones:
+        return []
+
+    nuevas = {}
+    for notificacion in notificaciones:
+        if not notificacion.leida:
+            nuevas[notificacion.usuario_id] = nuevas.get(notificacion.usuario_id, 0) + 1
+
+    with transaction.atomic():
+        creadas = Notificacion.objects.bulk_create(notificaciones)
+        # bulk_create no dispara signals
+        renovar_version_notificaciones(*{notificacion.usuario_id for notificacion in notificaciones})
+        ajustar_no_leidas(nuevas)
+        for notificacion in creadas:
+            publicar_notificacion(notificacion)
+    return creadas
+
+
+def notificar_varios(usuarios, mensaje):
+    """
+    Envía el mismo mensaje a varios usuarios (instancias o ids) con un solo INSERT.
+    """
+    from .models import Notificacion
+
+    usuarios_ids = dict.fromkeys(getattr(usuario, 'pk', usuario) for usuario in usuarios)
+    return crear_notificaciones([Notificacion(usuario_id=usuario_id, mensaje=mensaje) for usuario_id in usuarios_ids])
+
+
+def marcar_leidas(usuario_id, ids=None):
+    """
+    Marca como leídas las notificaciones sin leer del usuario (todas, o solo las de `ids`)
+    con un único UPDATE. Devuelve cuántas se marcaron.
+    """
+    from .models import Notificacion
+
+    pendientes = Notificacion.objects.filter(usuario_id=usuario_id, leida=False)
+    if ids is not None:
+        pendientes = pendientes.filter(id__in=ids)
+
+    with transaction.atomic():
+        marcadas = pendientes.update(leida=True)
+        if marcadas:
+            renovar_version_notificaciones(usuario_id)
+            # Descontar lo marcado (sin fijar el contador en 0): una notificación creada
+            # mientras tanto conserva su incremento
+            ajustar_no_leidas({usuario_id: -marcadas})
+    return marcadas
+
+
+def eliminar_notificaciones(usuario_id, ids):
+    """
+    Elimina las notificaciones del usuario indicadas en `ids` con un único DELETE.
+    Devuelve cuántas se eliminaron.
+    """
+    from .models import Notificacion
+
+    seleccion = Notificacion.objects.filter(usuario_id=usuario_id, id__in=ids)
+
+    with transaction.atomic():
+        # Bloquear las no leídas para descontarlas del contador sin carreras con marcar_leidas
+        sin_leer = len(seleccion.filter(leida=False).select_for_update().values_list('id', flat=True))
+        eliminadas, _ = seleccion.delete()
+        if eliminadas:
+            renovar_version_notificaciones(usuario_id)
+            ajustar_no_leidas({usuario_id: -sin_leer})
+    return eliminadas
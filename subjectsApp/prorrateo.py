@@ -0,0 +1,61 @@
+from bisect import bisect_left
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+CENTESIMA = Decimal("0.01")
+
+
+def a_centesimas(cantidad):
+    """
+    Convierte una cantidad decimal a un entero de centésimas.
+    """
+    return int(Decimal(cantidad).quantize(CENTESIMA, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+@lru_cache(maxsize=4096)
+def desde_centesimas(centesimas):
+    """
+    Convierte un entero de centésimas a Decimal con dos decimales.
+    """
+    return Decimal(centesimas).scaleb(-2).quantize(CENTESIMA)
+
+
+def repartir_matriz(cantidades, total_asientos):
+    """
+    Reparte cada cantidad entre `total_asientos` asientos por el método del resto mayor,
+    trabajando en centésimas enteras.
+
+    Con pesos iguales todos los restos empatan, así que las centésimas sobrantes se
+    entregan a los primeros asientos en orden. Cada fila de la matriz queda descrita por
+    el par (base, sobrantes) y la suma de las cuotas de todos los asientos es
+    exactamente la cantidad original.
+    """
+    if total_asientos <= 0:
+        return {}
+    return {
+        clave: divmod(a_centesimas(cantidad), total_asientos)
+        for clave, cantidad in cantidades.items()
+    }
+
+
+def cuota(fila, asiento):
+    """
+    Devuelve, en centésimas, la cuota de un asiento para una fila de `repartir_matriz`.
+    Los asientos fuera de rango reciben solo la cuota base.
+    """
+    base, sobrantes = fila
+    return base + 1 if asiento < sobrantes else base
+
+
+def cuotas_fila(fila, asientos_ordenados):
+    """
+    Devuelve las cuotas (Decimal) de una lista ordenada de asientos y su suma en centésimas.
+
+    Los asientos que reciben una centésima extra forman siempre un prefijo de la lista,
+    por lo que la fila se arma con dos bloques en vez de calcular alumno por alumno.
+    """
+    base, sobrantes = fila
+    total = len(asientos_ordenados)
+    con_extra = bisect_left(asientos_ordenados, sobrantes)
+    cuotas = [desde_centesimas(base + 1)] * con_extra + [desde_centesimas(base)] * (total - con_extra)
+    return cuotas, base * total + con_extra
@@ -0,0 +1,90 @@
+import csv
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class _Eco:
+    """
+    Objeto con interfaz de archivo que devuelve lo escrito en vez de guardarlo,
+    para que csv.writer produzca una línea a la vez.
+    """
+    def write(self, valor):
+        return valor
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Habilita `?format=csv` en las acciones que lo declaran. Las respuestas normales
+    (por ejemplo, errores) se escriben como una tabla a partir de sus claves.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        filas = data if isinstance(data, list) else [data]
+        columnas = list(filas[0].keys()) if filas else []
+        escritor = csv.writer(_Eco())
+        lineas = [escritor.writerow(columnas)] + [escritor.writerow([fila.get(c) for c in columnas]) for fila in filas]
+        return ''.join(lineas).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Habilita `?format=ndjson` (un objeto JSON por línea) en las acciones que lo declaran.
+    Las respuestas normales (por ejemplo, errores) se escriben como una sola línea.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        filas = data if isinstance(data, list) else [data]
+        return ''.join(_linea_json(fila) for fila in filas).encode(self.charset)
+
+
+def _linea_json(fila):
+    return json.dumps(fila, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+
+# Renderers por defecto más CSV, para las acciones que ofrecen exportación
+RENDERERS_CON_CSV = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer]
+
+# Renderers por defecto más CSV y NDJSON
+RENDERERS_CON_EXPORTACION = [*RENDERERS_CON_CSV, NDJSONRenderer]
+
+
+def respuesta_csv(filas, columnas, nombre_archivo):
+    """
+    Devuelve un StreamingHttpResponse que escribe el CSV a medida que se recorren las filas
+    (diccionarios), sin armar el documento completo en memoria.
+    """
+    escritor = csv.writer(_Eco())
+
+    def generar():
+        yield escritor.writerow(columnas)
+        for fila in filas:
+            yield escritor.writerow([fila.get(columna) for columna in columnas])
+
+    respuesta = StreamingHttpResponse(generar(), content_type='text/csv; charset=utf-8')
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
+
+
+def respuesta_ndjson(filas, nombre_archivo):
+    """
+    Devuelve un StreamingHttpResponse que escribe una línea JSON por fila (diccionario)
+    a medida que se recorren, sin armar el documento completo en memoria.
+    """
+    respuesta = StreamingHttpResponse(
+        (_linea_json(fila) for fila in filas), content_type='application/x-ndjson; charset=utf-8'
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
@@ -0,0 +1,119 @@
+import time
+from functools import wraps
+from hashlib import md5
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+# Tiempo máximo que se conserva un reporte en caché (segundos)
+DURACION_REPORTES = 60 * 10
+
+# Reportes cacheados; cada uno se invalida completo o solo para un alcance (asignatura, alumno)
+REPORTES = ('participacion', 'participacion_general', 'participacion_alumno', 'insumos')
+
+# Formatos que se envían en streaming y no se guardan en caché
+FORMATOS_SIN_CACHE = ('csv', 'ndjson')
+
+
+def _clave_generacion(reporte, alcance):
+    return f"reportes:{reporte}:{alcance}:generacion"
+
+
+def _clave_contador(reporte, tipo):
+    return f"reportes:estadisticas:{reporte}:{tipo}"
+
+
+def _incrementar(clave):
+    # Con Redis, incr es atómico. Con la caché en archivos (la predeterminada sin REDIS_URL)
+    # es leer y escribir: dos procesos pueden pisarse y perder algún incremento
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave no existe (nunca se creó o la caché la descartó)
+        if cache.add(clave, 1, None):
+            return 1
+        return cache.incr(clave)
+
+
+def _generaciones(claves):
+    """
+    Lee las generaciones indicadas y crea las que falten. Una generación nueva parte
+    de la hora actual en nanosegundos, de modo que nunca repite una anterior aunque
+    la caché la haya descartado.
+    """
+    generaciones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in generaciones:
+            cache.add(clave, time.time_ns(), None)
+            generaciones[clave] = cache.get(clave, time.time_ns())
+    return [generaciones[clave] for clave in claves]
+
+
+def clave_reporte(reporte, alcance, request):
+    """
+    Clave de caché de un reporte: incluye la generación vigente del reporte completo y
+    la del alcance, así que invalidar es solo descartar la generación; las entradas
+    viejas dejan de leerse y expiran por su TTL.
+    """
+    generaciones = _generaciones([_clave_generacion(reporte, '*'), _clave_generacion(reporte, alcance)])
+    version = '.'.join(str(generacion) for generacion in generaciones)
+    huella = md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"reportes:{reporte}:{alcance}:{version}:{huella}"
+
+
+def invalidar_reporte(reporte, *alcances):
+    """
+    Invalida un reporte para los alcances indicados o, sin alcances, completo.
+    Se aplica al confirmar la transacción en curso.
+    """
+    claves = [_clave_generacion(reporte, alcance) for alcance in (alcances or ('*',))]
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def cachear_reporte(reporte, alcance=None):
+    """
+    Decorador para las @action de reportes: guarda en caché las respuestas 200 en JSON
+    y cuenta aciertos y fallos. `alcance(request, **kwargs)` devuelve el alcance de la
+    respuesta (por ejemplo, el id de la asignatura) para poder invalidarla por separado.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(self, request, *args, **kwargs):
+            if request.accepted_renderer.format in FORMATOS_SIN_CACHE:
+                return vista(self, request, *args, **kwargs)
+
+            clave = clave_reporte(reporte, alcance(request, **kwargs) if alcance else '*', request)
+            data = cache.get(clave)
+            if data is not None:
+                _incrementar(_clave_contador(reporte, 'aciertos'))
+                return Response(data)
+
+            _incrementar(_clave_contador(reporte, 'fallos'))
+            respuesta = vista(self, request, *args, **kwargs)
+            if respuesta.status_code == 200 and isinstance(respuesta, Response):
+                cache.set(clave, respuesta.data, DURACION_REPORTES)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def estadisticas_reportes():
+    """
+    Devuelve los aciertos y fallos de caché de cada reporte desde el último reinicio.
+    Sin Redis los contadores son aproximados: con varios procesos pueden quedar por debajo
+    de lo real (ver _incrementar).
+    """
+    claves = {
+        (reporte, tipo): _clave_contador(reporte, tipo)
+        for reporte in REPORTES
+        for tipo in ('aciertos', 'fallos')
+    }
+    valores = cache.get_many(claves.values())
+    return {
+        reporte: {tipo: valores.get(claves[(reporte, tipo)], 0) for tipo in ('aciertos', 'fallos')}
+        for reporte in REPORTES
+    }
+
+
+def reiniciar_estadisticas_reportes():
+    cache.delete_many([_clave_contador(reporte, tipo) for reporte in REPORTES for tipo in ('aciertos', 'fallos')])
@@ -1,13 +1,23 @@
 # routes.py en subjectsApp
 
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import AsignaturaView, ClaseViewSet, SolicitudInsumoViewSet, NotificacionViewSet
+from .views import AsignaturaView, ClaseViewSet, SolicitudInsumoViewSet, NotificacionViewSet, TareaViewSet
+from .views_async import eventos, insumos_asignados, mis_insumos, notificaciones_alumno, historial_alumno
 
 router = DefaultRouter()
 router.register('asignaturas', AsignaturaView, basename='asignatura')  # Registrar rutas para asignaturas
 router.register('clases', ClaseViewSet, basename='clase')  # Registrar rutas para clases
 router.register('solicitudes', SolicitudInsumoViewSet, basename='solicitudes')  # Registrar rutas para solicitudes
 router.register('notificaciones', NotificacionViewSet, basename='notificaciones')  # Registrar rutas para notificaciones
+router.register('jobs', TareaViewSet, basename='jobs')  # Registrar rutas para consultar tareas en segundo plano
 
-urlpatterns = router.urls
+# Consultas de lectura frecuentes atendidas con vistas async (ORM async bajo ASGI)
+urlpatterns = [
+    path('clases/<int:pk>/insumos_asignados/', insumos_asignados, name='clase-insumos-asignados'),
+    path('clases/<int:pk>/mis_insumos/', mis_insumos, name='clase-mis-insumos'),
+    path('solicitudes/historial_alumno/', historial_alumno, name='solicitudes-historial-alumno'),
+    path('notificaciones/alumno/', notificaciones_alumno, name='notificaciones-alumno'),
+    path('eventos/', eventos, name='eventos'),  # Stream de eventos de clases y notificaciones (SSE, requiere ASGI)
+] + router.urls
 
@@ -1,24 +1,90 @@
 from rest_framework import serializers
-from .models import Asignatura, Clase, ClaseInsumo, ClaseDistribucion, ClaseParticipacion, ClaseInsumoHistorial, SolicitudInsumo, Notificacion
+from .models import Asignatura, Clase, ClaseInsumo, ClaseDistribucion, ClaseParticipacion, ClaseInsumoHistorial, SolicitudInsumo, Notificacion, Tarea
 from userApp.models import Usuario  # Asegúrate de tener el modelo Usuario
+from insumosApp.serializers import InsumoSerializer
+from rest_framework.permissions import SAFE_METHODS
 
 
-class AsignaturaSerializer(serializers.ModelSerializer):
+def _lista_parametro(valor):
+    return {nombre.strip() for nombre in (valor or '').split(',') if nombre.strip()}
+
+
+class CamposDinamicosMixin:
+    """
+    Permite elegir los campos de la respuesta en las lecturas con `?fields=a,b` (solo esos),
+    `?omit=a,b` (todos menos esos) y `?expand=a` (reemplaza el id de una relación de
+    `campos_expandibles` por su detalle). Los campos que no se devuelven no se calculan.
+    """
+    campos_expandibles = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expandidos = set()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        parametros = request.query_params
+        self.expandidos = _lista_parametro(parametros.get('expand')) & set(self.campos_expandibles)
+        for nombre in self.expandidos:
+            self.fields[nombre] = self.campos_expandibles[nombre](read_only=True)
+
+        incluidos = _lista_parametro(parametros.get('fields'))
+        excluidos = _lista_parametro(parametros.get('omit'))
+        for nombre in list(self.fields):
+            if (incluidos and nombre not in incluidos) or nombre in excluidos:
+                self.fields.pop(nombre)
+
+
+class UsuarioResumenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Usuario
+        fields = ['id', 'nombre', 'email']
+
+
+class AsignaturaResumenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Asignatura
+        fields = ['id', 'nombre']
+
+
+class ClaseResumenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Clase
+        fields = ['id', 'nombre', 'estado']
+
+
+class AsignaturaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Campos adicionales para mostrar el nombre del profesor y los nombres de los alumnos
     profesor_nombre = serializers.StringRelatedField(source='profesor', read_only=True)
-    alumnos_nombres = serializers.StringRelatedField(many=True, source='alumnos', read_only=True)
-    alumnos_email = serializers.StringRelatedField(many=True, source='alumnos', read_only=True)
+    alumnos_nombres = serializers.SerializerMethodField()
+    alumnos_email = serializers.SerializerMethodField()
     profesor = serializers.PrimaryKeyRelatedField(queryset=Usuario.objects.filter(rol='2'), write_only=True)
     alumnos = serializers.PrimaryKeyRelatedField(queryset=Usuario.objects.filter(rol='3'), write_only=True, many=True)
     cantidad_alumnos = serializers.SerializerMethodField()
     
-    
+    campos_expandibles = {'profesor': UsuarioResumenSerializer}
+
     class Meta:
         model = Asignatura
         fields = ['id', 'nombre', 'numero_clases', 'profesor', 'alumnos', 'profesor_nombre', 'alumnos_nombres', 'cantidad_alumnos', 'alumnos_email']
 
+    def _alumnos(self, obj):
+        # Una sola lectura de los alumnos (precargados por Asignatura.objects.con_detalle()) para ambos campos
+        if not hasattr(obj, '_alumnos_serializados'):
+            obj._alumnos_serializados = list(obj.alumnos.all())
+        return obj._alumnos_serializados
+
+    def get_alumnos_nombres(self, obj):
+        return [alumno.nombre for alumno in self._alumnos(obj)]
+
+    def get_alumnos_email(self, obj):
+        return [alumno.email for alumno in self._alumnos(obj)]
+
     def get_cantidad_alumnos(self, obj):
-        return obj.alumnos.count()
+        if hasattr(obj, 'total_alumnos'):
+            return obj.total_alumnos
+        return len(self._alumnos(obj))
 
         
 
@@ -29,13 +95,25 @@ class ClaseInsumoSerializer(serializers.ModelSerializer):
         model = ClaseInsumo
         fields = ['id', 'clase', 'insumo', 'cantidad', 'insumo_nombre']
 
-class ClaseSerializer(serializers.ModelSerializer):
+def _relacionados(obj, relacion, *select_related):
+    """
+    Devuelve los objetos de una relación inversa, usando los precargados por
+    Clase.objects.con_detalle() si existen y una consulta con select_related si no.
+    """
+    if relacion in getattr(obj, '_prefetched_objects_cache', {}):
+        return getattr(obj, relacion).all()
+    return getattr(obj, relacion).select_related(*select_related)
+
+
+class ClaseSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     insumos = ClaseInsumoSerializer(many=True, source='claseinsumo_set', required=False)
     ya_participa = serializers.SerializerMethodField()
     asistencia = serializers.SerializerMethodField()  # Nueva función para calcular la asistencia
     distribuciones = serializers.SerializerMethodField()
     historial_insumos = serializers.SerializerMethodField()  # Nuevo campo para mostrar insumos utilizados y devueltos
 
+    campos_expandibles = {'asignatura': AsignaturaResumenSerializer}
+
     class Meta:
         model = Clase
         fields = '__all__'
@@ -46,6 +124,8 @@ class ClaseSerializer(serializers.ModelSerializer):
         """
         request = self.context.get('request')
         if request and request.user.is_authenticated and request.user.rol == "3":  # Verifica que sea un alumno
+            if hasattr(obj, 'usuario_participa'):
+                return obj.usuario_participa
             return obj.participaciones.filter(alumno=request.user).exists()
         return False
 
@@ -53,6 +133,9 @@ class ClaseSerializer(serializers.ModelSerializer):
         """
         Calcula la asistencia actual para la clase en formato "participantes/total".
         """
+        if hasattr(obj, 'total_participantes'):
+            # Conteos anotados por Clase.objects.con_detalle()
+            return f"{obj.total_participantes}/{obj.total_inscritos}"
         # Total de alumnos que han participado en la clase
         alumnos_participantes = obj.participaciones.count()
         # Total de alumnos asignados a la asignatura
@@ -64,7 +147,7 @@ class ClaseSerializer(serializers.ModelSerializer):
         Devuelve las distribuciones de insumos en la clase, incluyendo tanto los insumos asignados inicialmente
         como los extras que hayan sido solicitados y aprobados.
         """
-        distribuciones = ClaseDistribucion.objects.filter(clase=obj).select_related('alumno', 'insumo')
+        distribuciones = _relacionados(obj, 'distribuciones', 'alumno', 'insumo')
         return [
             {
                 "alumno": distribucion.alumno.nombre,
@@ -81,7 +164,7 @@ class ClaseSerializer(serializers.ModelSerializer):
         Devuelve el historial de insumos de la clase (utilizados y devueltos al inventario).
         """
         if obj.estado == "finalizada":
-            historial = ClaseInsumoHistorial.objects.filter(clase=obj).select_related('insumo')
+            historial = _relacionados(obj, 'insumos_historial', 'insumo')
             serializer = ClaseInsumoHistorialSerializer(historial, many=True)
             return serializer.data
         return None
@@ -102,10 +185,16 @@ class ClaseInsumoHistorialSerializer(serializers.ModelSerializer):
         model = ClaseInsumoHistorial
         fields = ['insumo_nombre', 'unidad_medida', 'cantidad_total_asignada', 'cantidad_utilizada', 'cantidad_devuelta', 'cantidad_extra_asignada']
 
-class SolicitudInsumoSerializer(serializers.ModelSerializer):
+class SolicitudInsumoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     alumno_nombre = serializers.StringRelatedField(source="alumno.username")
     clase_nombre = serializers.StringRelatedField(source="clase.nombre")
 
+    campos_expandibles = {
+        'alumno': UsuarioResumenSerializer,
+        'clase': ClaseResumenSerializer,
+        'insumo': InsumoSerializer,
+    }
+
     class Meta:
         model = SolicitudInsumo
         fields = '__all__'
@@ -114,4 +203,10 @@ class SolicitudInsumoSerializer(serializers.ModelSerializer):
 class NotificacionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notificacion
-        fields = ['id', 'usuario', 'mensaje', 'leida', 'fecha_creacion']
\ No newline at end of file
+        fields = ['id', 'usuario', 'mensaje', 'leida', 'fecha_creacion']
+
+
+class TareaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tarea
+        fields = ['id', 'tipo', 'clase', 'estado', 'resultado', 'error', 'creado_en', 'actualizado_en']
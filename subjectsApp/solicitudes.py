@@ -0,0 +1,121 @@
+from collections import defaultdict
+from django.db import transaction
+from insumosApp.models import Insumo
+from .models import ClaseDistribucion, SolicitudInsumo, Notificacion
+from .versiones import renovar_version_clase
+from .notificaciones import crear_notificaciones
+
+# Máximo de solicitudes que se gestionan en un mismo lote
+MAXIMO_LOTE_SOLICITUDES = 1000
+
+ACCIONES_LOTE = ("aprobar", "rechazar")
+
+# Estado al que pasa cada solicitud del lote según la acción del administrador
+ESTADO_ACCION = {"aprobar": "aprobado", "rechazar": "rechazado"}
+
+
+def gestionar_lote(solicitudes_ids, accion, motivo=None):
+    """
+    Aprueba o rechaza como administrador un lote de solicitudes en estado 'pendiente_admin',
+    en una sola transacción, y devuelve un resultado por id (en el orden recibido).
+
+    Las solicitudes y los insumos se bloquean una sola vez (ordenados por id), el stock se
+    valida en memoria y se descuenta con UPDATE basados en F() (uno por clase, para que el
+    libro de movimientos conserve la clase), las cantidades extra se suman a las
+    distribuciones existentes o se crean en bloque, y las notificaciones se insertan juntas.
+    Las solicitudes que no se pueden aprobar quedan sin cambios y se informa el motivo.
+    El cambio de estado pasa por SolicitudInsumo.objects.transicionar_lote, con las
+    mismas transiciones permitidas que la gestión individual.
+    """
+    motivo = motivo or "Sin motivo proporcionado."
+    desde, hacia = "pendiente_admin", ESTADO_ACCION[accion]
+    resultados = {}
+
+    with transaction.atomic():
+        solicitudes = {
+            solicitud.id: solicitud
+            for solicitud in SolicitudInsumo.objects.select_for_update(of=('self',))
+            .filter(id__in=solicitudes_ids)
+            .select_related('clase')
+            .order_by('id')
+        }
+        insumos = {
+            insumo.id: insumo
+            for insumo in Insumo.objects.select_for_update()
+            .filter(id__in={solicitud.insumo_id for solicitud in solicitudes.values()})
+            .order_by('id')
+        }
+
+        disponible = {insumo_id: insumo.cantidad_total for insumo_id, insumo in insumos.items()}
+        gestionadas = []
+        notificaciones = []
+        descuentos = defaultdict(lambda: defaultdict(int))  # clase -> {insumo_id: cantidad}
+        extras = defaultdict(int)  # (clase_id, alumno_id, insumo_id) -> cantidad
+
+        for solicitud_id in solicitudes_ids:
+            if solicitud_id in resultados:
+                continue  # Id repetido en el lote
+            solicitud = solicitudes.get(solicitud_id)
+            if solicitud is None:
+                resultados[solicitud_id] = {"id": solicitud_id, "error": "La solicitud no existe."}
+                continue
+            if solicitud.estado != desde:
+                resultados[solicitud_id] = {"id": solicitud_id, "error": f"Solo puedes gestionar solicitudes en estado '{desde}'."}
+                continue
+
+            insumo = insumos[solicitud.insumo_id]
+            cantidad = solicitud.cantidad_solicitada
+
+            if accion == "aprobar":
+                if disponible[insumo.id] < cantidad:
+                    resultados[solicitud_id] = {
+                        "id": solicitud_id,
+                        "error": f"Inventario general insuficiente. Disponible: {disponible[insumo.id]}, solicitado: {cantidad}.",
+                    }
+                    continue
+                disponible[insumo.id] -= cantidad
+                descuentos[solicitud.clase][insumo.id] -= cantidad
+                extras[(solicitud.clase_id, solicitud.alumno_id, insumo.id)] += cantidad
+                mensaje = f"Tu solicitud de {cantidad} {insumo.nombre} ha sido aprobada por el administrador."
+                resultados[solicitud_id] = {"id": solicitud_id, "status": "Solicitud aprobada por el administrador."}
+            else:
+                mensaje = f"Tu solicitud de {cantidad} {insumo.nombre} ha sido rechazada por el administrador."
+                resultados[solicitud_id] = {"id": solicitud_id, "status": "Solicitud rechazada por el administrador."}
+
+            gestionadas.append(solicitud.id)
+            notificaciones.append(Notificacion(usuario_id=solicitud.alumno_id, mensaje=mensaje))
+
+        # Reducir del inventario general
+        for clase, ajustes in descuentos.items():
+            Insumo.objects.ajustar_stock(ajustes, 'solicitud', clase=clase)
+
+        # Registrar como cantidad extra asignada a cada alumno
+        existentes = {
+            (distribucion.clase_id, distribucion.alumno_id, distribucion.insumo_id): distribucion
+            for distribucion in ClaseDistribucion.objects.select_for_update().filter(
+                clase_id__in={clave[0] for clave in extras},
+                alumno_id__in={clave[1] for clave in extras},
+                insumo_id__in={clave[2] for clave in extras},
+            )
+            if (distribucion.clase_id, distribucion.alumno_id, distribucion.insumo_id) in extras
+        }
+        for clave, distribucion in existentes.items():
+            distribucion.cantidad_extra_asignada += extras[clave]
+        ClaseDistribucion.objects.bulk_update(existentes.values(), ['cantidad_extra_asignada'])
+        ClaseDistribucion.objects.bulk_create([
+            ClaseDistribucion(
+                clase_id=clase_id, alumno_id=alumno_id, insumo_id=insumo_id,
+                cantidad_asignada=0, cantidad_extra_asignada=cantidad,
+            )
+            for (clase_id, alumno_id, insumo_id), cantidad in extras.items()
+            if (clase_id, alumno_id, insumo_id) not in existentes
+        ])
+
+        campos = {"motivo_rechazo": motivo} if hacia == "rechazado" else {}
+        SolicitudInsumo.objects.transicionar_lote(gestionadas, desde, hacia, **campos)
+        crear_notificaciones(notificaciones)
+
+        # Las operaciones en bloque no disparan signals
+        renovar_version_clase(*{clase_id for clase_id, _, _ in extras})
+
+    return [resultados[solicitud_id] for solicitud_id in dict.fromkeys(solicitudes_ids)]
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import connections, transaction
+from django.utils import timezone
+from .models import Tarea
+from .finalizacion import cerrar_clase
+
+# Pool de hilos local del proceso; no se necesita un broker externo
+_ejecutor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tareas")
+
+# Una tarea activa sin cambios durante este tiempo se da por perdida (por ejemplo,
+# porque el proceso se reinició antes de terminarla)
+TIEMPO_MAXIMO_TAREA = timedelta(minutes=10)
+
+ESTADOS_ACTIVOS = ('pendiente', 'en_proceso')
+
+
+def marcar_tareas_vencidas():
+    """
+    Marca como fallidas las tareas activas que superaron TIEMPO_MAXIMO_TAREA, para que
+    no bloqueen una nueva finalización de la misma clase. Devuelve cuántas marcó.
+    """
+    return Tarea.objects.filter(
+        estado__in=ESTADOS_ACTIVOS, actualizado_en__lt=timezone.now() - TIEMPO_MAXIMO_TAREA
+    ).update(
+        estado='fallida',
+        error="La tarea no terminó a tiempo (el servidor pudo reiniciarse). Vuelve a finalizar la clase.",
+        actualizado_en=timezone.now(),
+    )
+
+
+def encolar_finalizacion(clase, usuario):
+    """
+    Registra una tarea para finalizar la clase y la envía al pool de hilos una vez
+    confirmada la transacción. Si ya hay una tarea activa para la clase, la reutiliza.
+    """
+    marcar_tareas_vencidas()
+    with transaction.atomic():
+        tarea = Tarea.objects.filter(
+            tipo='finalizar_clase', clase=clase, estado__in=ESTADOS_ACTIVOS
+        ).first()
+        if tarea is None:
+            tarea = Tarea.objects.create(tipo='finalizar_clase', clase=clase, usuario=usuario)
+            transaction.on_commit(lambda: _ejecutor.submit(_ejecutar_finalizacion, tarea.id))
+    return tarea
+
+
+def _terminar(tarea_id, **campos):
+    # Solo si la tarea sigue en proceso: si se marcó como vencida, no se sobrescribe
+    return Tarea.objects.filter(id=tarea_id, estado='en_proceso').update(actualizado_en=timezone.now(), **campos)
+
+
+def _ejecutar_finalizacion(tarea_id):
+    try:
+        # Tomar la tarea solo si sigue pendiente (evita ejecutarla dos veces)
+        if not Tarea.objects.filter(id=tarea_id, estado='pendiente').update(estado='en_proceso', actualizado_en=timezone.now()):
+            return
+
+        clase = Tarea.objects.select_related('clase').get(id=tarea_id).clase
+
+        if clase is None or clase.estado != "iniciada":
+            _terminar(tarea_id, estado='fallida', error="Solo se pueden finalizar clases en estado 'iniciada'.")
+            return
+
+        try:
+            resultado = cerrar_clase(clase)
+        except Exception as e:
+            _terminar(tarea_id, estado='fallida', error=f"Error al finalizar la clase: {str(e)}")
+            return
+
+        _terminar(tarea_id, estado='completada', resultado=resultado)
+    finally:
+        # Cada hilo abre sus propias conexiones; cerrarlas al terminar
+        connections.close_all()
@@ -1,3 +1,500 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipUnless
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Sum
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from insumosApp.models import Insumo, MovimientoInventario
+from userApp.models import Usuario
+from .models import (
+    Asignatura, Clase, ClaseInsumo, ClaseParticipacion, ClaseDistribucion, ClaseAlumnoInsumoHistorial,
+    ParticipacionResumen, SolicitudInsumo, Notificacion, Tarea,
+)
+from .distribucion import registrar_participacion, construir_tabla_cuotas
+from .inventario import reservar_insumos
+from .solicitudes import gestionar_lote
+from .finalizacion import cerrar_clase
+from .notificaciones import marcar_leidas, no_leidas, notificar_varios
+from .tareas import encolar_finalizacion, TIEMPO_MAXIMO_TAREA
+from .prorrateo import repartir_matriz, cuotas_fila, cuota, a_centesimas, desde_centesimas
 
-# Create your tests here.
+
+def crear_usuario(rol, nombre):
+    return Usuario.objects.create_user(email=f"{nombre}@test.cl", nombre=nombre, password="clave", rol=rol)
+
+
+def crear_asignatura(total_alumnos, numero_clases=1):
+    profesor = crear_usuario("2", "profesor")
+    alumnos = Usuario.objects.bulk_create([
+        Usuario(email=f"alumno{i}@test.cl", nombre=f"alumno{i}", rol="3") for i in range(total_alumnos)
+    ])
+    asignatura = Asignatura.objects.create(nombre="Química", numero_clases=numero_clases, profesor=profesor)
+    asignatura.alumnos.set(alumnos)
+    return asignatura, profesor, alumnos
+
+
+def crear_insumo(nombre, cantidad_total):
+    return Insumo.objects.create(nombre=nombre, cantidad_total=cantidad_total, unidad_medida='1')
+
+
+def cliente(usuario):
+    cliente = APIClient()
+    cliente.force_authenticate(usuario)
+    return cliente
+
+
+def en_hilos(funcion, argumentos, hilos):
+    """
+    Ejecuta `funcion` para cada argumento desde varios hilos a la vez; cada hilo cierra
+    su conexión al terminar. Devuelve los resultados en orden.
+    """
+    def ejecutar(argumento):
+        try:
+            return funcion(argumento)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        return list(ejecutor.map(ejecutar, argumentos))
+
+
+class PruebaConcurrente(TransactionTestCase):
+    """
+    Base de las pruebas con hilos: necesitan una base de datos que vean todas las conexiones
+    (no sirve la SQLite en memoria de las pruebas).
+    """
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Las pruebas concurrentes requieren PostgreSQL o SQLite en archivo.")
+        cache.clear()
+        # Conexiones abiertas desde otros hilos: deben quedar cerradas al terminar la prueba
+        # (en PostgreSQL, una abierta impide borrar la base de pruebas)
+        self.conexiones_hilos = []
+        connection_created.connect(self.registrar_conexion)
+        self.addCleanup(connection_created.disconnect, self.registrar_conexion)
+
+    def registrar_conexion(self, sender, connection, **kwargs):
+        if threading.current_thread() is not threading.main_thread():
+            self.conexiones_hilos.append(connection)
+
+    def tearDown(self):
+        abiertas = [conexion for conexion in self.conexiones_hilos if conexion.connection is not None]
+        self.assertEqual(abiertas, [], "Quedaron conexiones abiertas en otros hilos.")
+
+
+class ProrrateoTests(SimpleTestCase):
+    def test_cuotas_suman_exactamente_la_cantidad(self):
+        cantidades = {1: Decimal("10.00"), 2: Decimal("0.07"), 3: Decimal("12345.67")}
+        for total in (1, 3, 7, 9999):
+            matriz = repartir_matriz(cantidades, total)
+            for insumo_id, cantidad in cantidades.items():
+                cuotas, suma = cuotas_fila(matriz[insumo_id], list(range(total)))
+                self.assertEqual(suma, a_centesimas(cantidad))
+                self.assertEqual(sum(cuotas), cantidad)
+
+    def test_sobrantes_van_a_los_primeros_asientos(self):
+        fila = repartir_matriz({1: Decimal("1.00")}, 3)[1]
+        self.assertEqual([desde_centesimas(cuota(fila, asiento)) for asiento in range(4)],
+                         [Decimal("0.34"), Decimal("0.33"), Decimal("0.33"), Decimal("0.33")])
+
+    def test_benchmark_reparto(self):
+        salida = StringIO()
+        call_command('benchmark_reparto', alumnos=[200], insumos=3, repeticiones=1, stdout=salida)
+        self.assertIn("prorrateo", salida.getvalue())
+        self.assertIn("(desvío 0 centésimas)", salida.getvalue())
+
+
+class ParticipacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.asignatura, self.profesor, self.alumnos = crear_asignatura(3)
+        self.clase = self.asignatura.clase_set.get()
+        for i in range(3):
+            ClaseInsumo.objects.create(clase=self.clase, insumo=crear_insumo(f"insumo{i}", 100), cantidad=Decimal("10.00"))
+        self.clase.estado = "iniciada"
+        self.clase.save()
+        # La tabla se guarda en caché al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            construir_tabla_cuotas(self.clase, dict(self.clase.claseinsumo_set.values_list('insumo_id', 'cantidad')))
+
+    def test_participar_tiene_un_presupuesto_fijo_de_consultas(self):
+        # Clase, transacción (SAVEPOINT/RELEASE dentro de TestCase), participación (SELECT,
+        # SAVEPOINT, INSERT, RELEASE), resumen, asignatura para invalidar reportes y
+        # un solo INSERT para todas las distribuciones; no depende del tamaño de la clase
+        with self.assertNumQueries(10):
+            respuesta = cliente(self.alumnos[0]).post(f'/subjects/clases/{self.clase.id}/participar/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(ClaseDistribucion.objects.filter(alumno=self.alumnos[0]).count(), 3)
+
+    def test_participar_suma_una_vez_al_resumen(self):
+        self.assertTrue(registrar_participacion(self.clase, self.alumnos[0]))
+        self.assertFalse(registrar_participacion(self.clase, self.alumnos[0]))
+        resumen = ParticipacionResumen.objects.get(asignatura=self.asignatura, alumno=self.alumnos[0])
+        self.assertEqual(resumen.clases_participadas, 1)
+        self.assertEqual(ClaseDistribucion.objects.filter(alumno=self.alumnos[0]).count(), 3)
+
+
+class CambiarEstadoTests(TestCase):
+    def test_tabla_de_cuotas_usa_las_cantidades_asignadas(self):
+        cache.clear()
+        asignatura, profesor, alumnos = crear_asignatura(4)
+        clase = asignatura.clase_set.get()
+        insumo = crear_insumo("reactivo", 100)
+        self.assertEqual(reservar_insumos(clase, [{'insumo_id': insumo.id, 'cantidad': 10}]), [])
+        Clase.objects.filter(id=clase.id).update(estado='asignada')
+        # Dos alumnos ya participan al iniciar la clase: el reparto les entrega su parte
+        for alumno in alumnos[:2]:
+            ClaseParticipacion.objects.create(clase=clase, alumno=alumno)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = cliente(profesor).post(f'/subjects/clases/{clase.id}/cambiar_estado/', {'estado': 'iniciada'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(ClaseInsumo.objects.get(clase=clase).cantidad, Decimal("5.00"))
+
+        # Los que se unen después reciben la cuota de 10.00 entre 4, no de lo que quedó en la clase
+        for alumno in alumnos[2:]:
+            self.assertTrue(registrar_participacion(clase, alumno))
+        cuotas = ClaseDistribucion.objects.filter(clase=clase).values_list('cantidad_asignada', flat=True)
+        self.assertEqual(sorted(cuotas), [Decimal("2.50")] * 4)
+        # Sin la tabla en caché, se reconstruye con las mismas cantidades
+        cache.clear()
+        self.assertEqual(construir_tabla_cuotas(clase), construir_tabla_cuotas(clase, {insumo.id: Decimal("10.00")}))
+
+
+class TareasTests(TestCase):
+    def setUp(self):
+        asignatura, self.profesor, _ = crear_asignatura(2)
+        self.clase = asignatura.clase_set.get()
+        Clase.objects.filter(id=self.clase.id).update(estado='iniciada')
+
+    def test_una_tarea_perdida_no_bloquea_la_clase(self):
+        perdida = Tarea.objects.create(tipo='finalizar_clase', clase=self.clase, usuario=self.profesor, estado='en_proceso')
+        # Sigue vigente: se reutiliza
+        self.assertEqual(encolar_finalizacion(self.clase, self.profesor).id, perdida.id)
+
+        Tarea.objects.filter(id=perdida.id).update(actualizado_en=timezone.now() - TIEMPO_MAXIMO_TAREA - timedelta(minutes=1))
+        nueva = encolar_finalizacion(self.clase, self.profesor)
+        self.assertNotEqual(nueva.id, perdida.id)
+        self.assertEqual(nueva.estado, 'pendiente')
+        perdida.refresh_from_db()
+        self.assertEqual(perdida.estado, 'fallida')
+
+    def test_finalizar_dos_veces_falla_la_segunda(self):
+        cerrar_clase(self.clase)
+        with self.assertRaises(ValueError):
+            cerrar_clase(self.clase)
+
+
+class NoLeidasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alumno = crear_usuario("3", "alumno")
+
+    def contar_tras_cambios(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(no_leidas(self.alumno.id), 0)
+            notificar_varios([self.alumno], "Primera")
+            notificar_varios([self.alumno], "Segunda")
+        self.assertEqual(no_leidas(self.alumno.id), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(marcar_leidas(self.alumno.id), 2)
+        self.assertEqual(no_leidas(self.alumno.id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notificar_varios([self.alumno], "Tercera")
+        self.assertEqual(no_leidas(self.alumno.id), 1)
+
+    def test_contador_sin_redis_se_recuenta(self):
+        self.contar_tras_cambios()
+
+    def test_contador_con_incremento_atomico(self):
+        with mock.patch('subjectsApp.notificaciones._incremento_atomico', return_value=True):
+            self.contar_tras_cambios()
+
+
+class AutenticacionAsyncTests(TestCase):
+    def setUp(self):
+        self.alumno = crear_usuario("3", "alumno")
+        self.token = str(RefreshToken.for_user(self.alumno).access_token)
+
+    async def test_token_en_la_url_solo_para_el_stream(self):
+        cliente_async = AsyncClient()
+        respuesta = await cliente_async.get('/subjects/notificaciones/alumno/', {'token': self.token})
+        self.assertEqual(respuesta.status_code, 401)
+        respuesta = await cliente_async.get(
+            '/subjects/notificaciones/alumno/', headers={'Authorization': f"Bearer {self.token}"}
+        )
+        self.assertEqual(respuesta.status_code, 200)
+
+        respuesta = await cliente_async.get('/subjects/eventos/', {'token': self.token})
+        self.assertEqual(respuesta.status_code, 200)
+        eventos = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(eventos), b"retry: 5000\n\n")
+        await eventos.aclose()
+
+    async def test_paginacion_por_cursor_en_vista_async(self):
+        await Notificacion.objects.abulk_create([Notificacion(usuario=self.alumno, mensaje=f"Aviso {i}") for i in range(3)])
+        cliente_async = AsyncClient()
+        url, mensajes = '/subjects/notificaciones/alumno/?page_size=2', []
+        while url:
+            datos = (await cliente_async.get(url, headers={'Authorization': f"Bearer {self.token}"})).json()
+            mensajes += [notificacion['mensaje'] for notificacion in datos['results']]
+            url = datos['next']
+        self.assertEqual(sorted(mensajes), ["Aviso 0", "Aviso 1", "Aviso 2"])
+
+    def test_el_stream_requiere_asgi(self):
+        respuesta = Client().get('/subjects/eventos/', headers={'Authorization': f"Bearer {self.token}"})
+        self.assertEqual(respuesta.status_code, 501)
+
+
+class ReporteParticipacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = crear_usuario("1", "admin")
+
+    def preparar(self, total_alumnos):
+        Usuario.objects.exclude(id=self.admin.id).delete()
+        Asignatura.objects.all().delete()
+        # Dentro de TestCase no se ejecutan los on_commit que invalidan los reportes
+        cache.clear()
+        asignatura, _, alumnos = crear_asignatura(total_alumnos, numero_clases=3)
+        for clase in asignatura.clase_set.all()[:2]:
+            for alumno in alumnos[::2]:
+                registrar_participacion(clase, alumno)
+        return asignatura
+
+    def test_reporte_por_asignatura_no_depende_del_numero_de_alumnos(self):
+        # Asignatura, total de clases y una página del conteo agrupado por alumno
+        for total_alumnos in (3, 40):
+            asignatura = self.preparar(total_alumnos)
+            with self.assertNumQueries(3):
+                respuesta = cliente(self.admin).get(f'/subjects/asignaturas/{asignatura.id}/reporte_participacion/')
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(len(respuesta.data['results']), total_alumnos)
+            self.assertEqual(respuesta.data['results'][0]['clases_participadas'], 2)
+
+    def test_reporte_csv_no_depende_del_numero_de_alumnos(self):
+        for total_alumnos in (3, 40):
+            asignatura = self.preparar(total_alumnos)
+            # En CSV el conteo agrupado se lee completo, en una sola consulta con cursor
+            with self.assertNumQueries(3):
+                respuesta = cliente(self.admin).get(f'/subjects/asignaturas/{asignatura.id}/reporte_participacion/?format=csv')
+                contenido = b''.join(respuesta.streaming_content).decode()
+            self.assertEqual(len(contenido.splitlines()), total_alumnos + 1)
+
+    def test_reporte_general_y_por_alumno_leen_el_resumen(self):
+        for total_alumnos in (3, 40):
+            asignatura = self.preparar(total_alumnos)
+            alumno = asignatura.alumnos.order_by('id').first()
+            with self.assertNumQueries(1):
+                respuesta = cliente(self.admin).get('/subjects/asignaturas/reporte_participacion_general/')
+            self.assertEqual(respuesta.data['results'][0]['total_participaciones'], 2 * len(range(0, total_alumnos, 2)))
+            with self.assertNumQueries(2):
+                respuesta = cliente(self.admin).get(f'/subjects/asignaturas/reporte_participacion_alumno/?alumno_id={alumno.id}')
+            self.assertEqual(respuesta.data['results'][0]['clases_participadas'], 2)
+
+
+class ParticipacionConcurrenteTests(PruebaConcurrente):
+    TOTAL_ALUMNOS = 300
+
+    def test_300_participaciones_simultaneas(self):
+        asignatura, _, alumnos = crear_asignatura(self.TOTAL_ALUMNOS)
+        clase = asignatura.clase_set.get()
+        insumo = crear_insumo("reactivo", 1000)
+        ClaseInsumo.objects.create(clase=clase, insumo=insumo, cantidad=Decimal("100.00"))
+        clase.estado = "iniciada"
+        clase.save()
+        construir_tabla_cuotas(clase, {insumo.id: Decimal("100.00")})
+
+        # Cada alumno se une dos veces (reintento) desde 32 hilos
+        resultados = en_hilos(lambda alumno: registrar_participacion(clase, alumno), alumnos * 2, hilos=32)
+
+        self.assertEqual(resultados.count(True), self.TOTAL_ALUMNOS)
+        self.assertEqual(ClaseParticipacion.objects.filter(clase=clase).count(), self.TOTAL_ALUMNOS)
+        cuotas = ClaseDistribucion.objects.filter(clase=clase).values_list('cantidad_asignada', flat=True)
+        self.assertEqual(sum(cuotas), Decimal("100.00"))
+        self.assertEqual(
+            set(ParticipacionResumen.objects.filter(asignatura=asignatura).values_list('clases_participadas', flat=True)),
+            {1},
+        )
+
+
+class ReservaConcurrenteTests(PruebaConcurrente):
+    def test_reservas_simultaneas_no_sobrevenden(self):
+        asignatura, _, _ = crear_asignatura(0, numero_clases=4)
+        clases = list(asignatura.clase_set.all())
+        a, b = crear_insumo("ácido", 100), crear_insumo("base", 100)
+
+        # 40 reservas de 7 + 3 sobre cuatro clases, la mitad con los insumos en orden inverso
+        pedidos = [
+            (clases[i % 4], [{'insumo_id': a.id, 'cantidad': 7}, {'insumo_id': b.id, 'cantidad': 3}][::1 if i % 2 else -1])
+            for i in range(40)
+        ]
+        errores = en_hilos(lambda pedido: reservar_insumos(*pedido), pedidos, hilos=16)
+
+        # Solo caben 14 reservas de 7 en 100
+        self.assertEqual(sum(1 for e in errores if not e), 14)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.cantidad_total, b.cantidad_total), (Decimal("2.00"), Decimal("58.00")))
+        asignado = ClaseInsumo.objects.filter(insumo=a).values_list('cantidad', flat=True)
+        self.assertEqual(sum(asignado), Decimal("98.00"))
+        # El libro de movimientos cuadra con el stock inicial
+        movimientos = MovimientoInventario.objects.filter(insumo=a).values_list('cantidad', flat=True)
+        self.assertEqual(100 + sum(movimientos), a.cantidad_total)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Los planes de ejecución se comprueban en PostgreSQL.")
+class IndicesTests(TestCase):
+    """
+    Cada consulta frecuente de las vistas debe resolverse con su índice (el nombre de
+    Meta.indexes). Con enable_seqscan desactivado PostgreSQL solo recorre la tabla completa
+    si ningún índice sirve, así que el plan no depende del volumen sembrado.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        asignatura, _, alumnos = crear_asignatura(50, numero_clases=4)
+        insumo = crear_insumo("reactivo", 1000)
+        clases = list(asignatura.clase_set.all())
+        cls.asignatura, cls.alumno, cls.clase = asignatura, alumnos[0], clases[0]
+
+        SolicitudInsumo.objects.bulk_create([
+            SolicitudInsumo(alumno=alumno, clase=clase, insumo=insumo, cantidad_solicitada=1,
+                            estado=estado, es_extra=es_extra)
+            for alumno in alumnos
+            for clase in clases
+            for estado, es_extra in (('pendiente', False), ('pendiente_admin', True), ('aprobado', False))
+        ])
+        Notificacion.objects.bulk_create([
+            Notificacion(usuario=alumno, mensaje=f"Aviso {i}", leida=i % 5 != 0)
+            for alumno in alumnos
+            for i in range(20)
+        ])
+        ClaseDistribucion.objects.bulk_create([
+            ClaseDistribucion(clase=clase, alumno=alumno, insumo=insumo, cantidad_asignada=1)
+            for clase in clases
+            for alumno in alumnos
+        ])
+        ClaseAlumnoInsumoHistorial.objects.bulk_create([
+            ClaseAlumnoInsumoHistorial(clase=clase, alumno=alumno, insumo=insumo, cantidad_asignada=1)
+            for clase in clases
+            for alumno in alumnos
+        ])
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, msg=f"{queryset.query}\n{plan}")
+        self.assertIn(indice, plan, msg=f"{queryset.query}\n{plan}")
+
+    def test_bandejas_de_solicitudes(self):
+        self.assertUsaIndice(SolicitudInsumo.objects.filter(estado='pendiente', es_extra=False), 'solicitud_estado_extra_idx')
+        self.assertUsaIndice(SolicitudInsumo.objects.filter(estado='pendiente_admin'), 'solicitud_estado_extra_idx')
+        self.assertUsaIndice(SolicitudInsumo.objects.filter(clase=self.clase, estado='pendiente'), 'solicitud_clase_estado_idx')
+        self.assertUsaIndice(
+            SolicitudInsumo.objects.filter(alumno=self.alumno).order_by('-creado_en')[:51], 'solicitud_alumno_fecha_idx'
+        )
+        self.assertUsaIndice(SolicitudInsumo.objects.order_by('-creado_en', '-id')[:51], 'solicitud_fecha_id_idx')
+
+    def test_notificaciones(self):
+        self.assertUsaIndice(
+            Notificacion.objects.filter(usuario=self.alumno).order_by('-fecha_creacion', '-id')[:51],
+            'notificacion_usuario_fecha_idx',
+        )
+        self.assertUsaIndice(Notificacion.objects.filter(usuario=self.alumno, leida=False).values('id'), 'notificacion_no_leida_idx')
+
+    def test_distribuciones_e_historial(self):
+        # Cantidad repartida por insumo, como en insumos_asignados
+        self.assertUsaIndice(
+            ClaseDistribucion.objects.filter(clase=self.clase).values_list('insumo_id').annotate(total=Sum('cantidad_asignada')),
+            'distribucion_clase_insumo_idx',
+        )
+        self.assertUsaIndice(
+            ClaseAlumnoInsumoHistorial.objects.filter(clase=self.clase, alumno=self.alumno), 'historial_clase_alumno_idx'
+        )
+
+    def test_clases_y_usuarios(self):
+        self.assertUsaIndice(Clase.objects.filter(asignatura=self.asignatura, estado='iniciada'), 'clase_asignatura_estado_idx')
+        # Usuario.rol usa db_index, con el nombre que genera Django
+        with connection.cursor() as cursor:
+            restricciones = connection.introspection.get_constraints(cursor, Usuario._meta.db_table)
+        indice_rol = next(
+            nombre for nombre, restriccion in restricciones.items()
+            if restriccion['index'] and restriccion['columns'] == ['rol']
+        )
+        self.assertUsaIndice(Usuario.objects.filter(rol='3').values('id'), indice_rol)
+
+
+class GestionSolicitudConcurrenteTests(PruebaConcurrente):
+    def setUp(self):
+        super().setUp()
+        asignatura, _, self.alumnos = crear_asignatura(5)
+        self.clase = asignatura.clase_set.get()
+        self.insumo = crear_insumo("reactivo", 100)
+        self.admin = crear_usuario("1", "admin")
+        self.solicitudes = SolicitudInsumo.objects.bulk_create([
+            SolicitudInsumo(alumno=alumno, clase=self.clase, insumo=self.insumo,
+                            cantidad_solicitada=Decimal("10.00"), estado='pendiente_admin')
+            for alumno in self.alumnos
+        ])
+
+    def test_aprobaciones_simultaneas_solo_una_gana(self):
+        solicitud = self.solicitudes[0]
+        respuestas = en_hilos(
+            lambda _: cliente(self.admin).post(f'/subjects/solicitudes/{solicitud.id}/gestionar_solicitud/', {'accion': 'aprobar'}),
+            range(8), hilos=8,
+        )
+        self.assertEqual(sorted(respuesta.status_code for respuesta in respuestas), [200] + [403] * 7)
+        self.insumo.refresh_from_db()
+        self.assertEqual(self.insumo.cantidad_total, Decimal("90.00"))
+        self.assertEqual(
+            ClaseDistribucion.objects.get(alumno=solicitud.alumno_id).cantidad_extra_asignada, Decimal("10.00")
+        )
+
+    def test_lotes_simultaneos_gestionan_cada_solicitud_una_vez(self):
+        ids = [solicitud.id for solicitud in self.solicitudes]
+        # Lotes solapados, en distinto orden y con las dos acciones
+        lotes = [(ids, "aprobar"), (ids[::-1], "rechazar"), (ids[2:], "aprobar"), (ids[:3], "rechazar")]
+        resultados = en_hilos(lambda lote: gestionar_lote(*lote), lotes, hilos=4)
+
+        gestionadas = [r["id"] for resultado in resultados for r in resultado if "status" in r]
+        self.assertEqual(sorted(gestionadas), sorted(ids))
+        aprobadas = SolicitudInsumo.objects.filter(id__in=ids, estado='aprobado').count()
+        self.insumo.refresh_from_db()
+        self.assertEqual(self.insumo.cantidad_total, Decimal("100.00") - 10 * aprobadas)
+        self.assertEqual(SolicitudInsumo.objects.filter(id__in=ids, estado__in=('aprobado', 'rechazado')).count(), len(ids))
+
+    def test_el_lote_respeta_las_transiciones(self):
+        with self.assertRaises(ValueError):
+            SolicitudInsumo.objects.transicionar_lote([self.solicitudes[0].id], 'aprobado', 'rechazado')
+        SolicitudInsumo.objects.filter(id=self.solicitudes[0].id).update(estado='pendiente')
+        resultado = gestionar_lote([self.solicitudes[0].id], "aprobar")
+        self.assertIn("error", resultado[0])
+        self.assertEqual(SolicitudInsumo.objects.get(id=self.solicitudes[0].id).estado, 'pendiente')
+
+
+class BenchmarkServidoresTests(PruebaConcurrente):
+    def test_compara_wsgi_y_asgi(self):
+        asignatura, profesor, _ = crear_asignatura(3)
+        crear_insumo("reactivo", 10)
+        salida = StringIO()
+        call_command(
+            'benchmark_servidores', email=profesor.email, peticiones=20, concurrencia=4,
+            rutas=['/insumos/insumos/', f'/subjects/clases/{asignatura.clase_set.get().id}/insumos_asignados/'],
+            stdout=salida,
+        )
+        lineas = salida.getvalue().splitlines()
+        self.assertEqual([linea.split(':')[0].split()[0] for linea in lineas], ['wsgi', 'asgi', 'wsgi', 'asgi'])
+        self.assertTrue(all(linea.endswith(", 0 errores") for linea in lineas), lineas)
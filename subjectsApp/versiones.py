@@ -0,0 +1,56 @@
+from hashlib import md5
+from uuid import uuid4
+from django.core.cache import cache
+from django.db import transaction
+
+
+def clave_version_clase(clase_id):
+    return f"subjects:clase:{clase_id}:version"
+
+
+def clave_version_notificaciones(usuario_id):
+    return f"subjects:usuario:{usuario_id}:notificaciones:version"
+
+
+def _version(clave):
+    """
+    Devuelve la marca de versión guardada en `clave`, creándola si no existe
+    (por ejemplo, tras renovarla o si la caché la descartó).
+    """
+    cache.add(clave, uuid4().hex, None)
+    return cache.get(clave) or uuid4().hex
+
+
+def _renovar(claves):
+    # Se descarta al confirmar la transacción, para que nadie guarde la versión nueva
+    # junto con datos que todavía no están confirmados
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def renovar_version_clase(*clases_ids):
+    _renovar([clave_version_clase(clase_id) for clase_id in clases_ids])
+
+
+def renovar_version_notificaciones(*usuarios_ids):
+    _renovar([clave_version_notificaciones(usuario_id) for usuario_id in usuarios_ids])
+
+
+def _etag(version, request):
+    # La respuesta depende también del usuario (por ejemplo, `ya_participa`) y de los parámetros
+    huella = md5(f"{version}|{request.user.pk}|{request.get_full_path()}".encode()).hexdigest()
+    return f'W/"{huella}"'
+
+
+def etag_clase(request, pk=None, *args, **kwargs):
+    """
+    ETag débil de las vistas de una clase; cambia cada vez que se guarda la clase o
+    sus participaciones, distribuciones o insumos asignados.
+    """
+    return _etag(_version(clave_version_clase(pk)), request)
+
+
+def etag_notificaciones(request, *args, **kwargs):
+    """
+    ETag débil de las notificaciones del usuario autenticado.
+    """
+    return _etag(_version(clave_version_notificaciones(request.user.pk)), request)
@@ -2,92 +2,76 @@ from django.shortcuts import render
 from rest_framework import viewsets
 from userApp.permissions import IsProfesor, IsAdmin, IsEstudiante, IsProfesorOrAdmin
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from .models import Asignatura, Clase, ClaseParticipacion, ClaseDistribucion, ClaseInsumoHistorial, ClaseAlumnoInsumoHistorial, SolicitudInsumo, Notificacion
-from .serializers import AsignaturaSerializer, ClaseSerializer, ClaseInsumoHistorialSerializer, SolicitudInsumoSerializer, NotificacionSerializer
+from .models import Asignatura, Clase, ClaseParticipacion, ClaseDistribucion, ClaseInsumoHistorial, ClaseAlumnoInsumoHistorial, SolicitudInsumo, Notificacion, Tarea, ParticipacionResumen
+from .serializers import AsignaturaSerializer, ClaseSerializer, ClaseInsumoHistorialSerializer, SolicitudInsumoSerializer, NotificacionSerializer, TareaSerializer
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Asignatura, Clase, ClaseInsumo
 from rest_framework import viewsets, status
 from insumosApp.models import Insumo
+from insumosApp.catalogo import id_insumo_por_nombre
 from django.db import transaction
 from django.db.models import Sum
 from decimal import Decimal
-from django.db.models import F, Count
+from django.db.models import F, Count, Q, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from userApp.models import Usuario
 from decimal import Decimal  # Asegúrate de importar Decimal
+from .distribucion import distribuir_insumos, construir_tabla_cuotas, registrar_participacion
+from .finalizacion import cerrar_clase
+from .tareas import encolar_finalizacion, marcar_tareas_vencidas
+from .inventario import reservar_insumos, devolver_insumos
+from .solicitudes import gestionar_lote, ACCIONES_LOTE, MAXIMO_LOTE_SOLICITUDES
+from .notificaciones import notificar_varios, no_leidas, marcar_leidas, eliminar_notificaciones, MAXIMO_LOTE_NOTIFICACIONES
+from .renderers import RENDERERS_CON_CSV, RENDERERS_CON_EXPORTACION, respuesta_csv, respuesta_ndjson
+from .consultas import SubconsultaConteo
+from .versiones import etag_clase, renovar_version_clase
+from .reportes import cachear_reporte
+from back_gestion_insumos.pagination import PaginacionCursor
 
 # Create your views here.
-def distribuir_insumos(clase):
+
+def campos_serializador(serializador):
     """
-    Distribuye insumos proporcionalmente a los alumnos que participan en la clase.
-    Los insumos no asignados permanecen en la clase.
+    Devuelve los campos que entregará el serializador y los que expande, según `?fields=`,
+    `?omit=` y `?expand=`, para preparar el queryset solo con lo necesario.
     """
-    # Obtener participantes y los insumos asignados a la clase
-    participantes = ClaseParticipacion.objects.filter(clase=clase).select_related('alumno')
-    insumos_asignados = ClaseInsumo.objects.filter(clase=clase)
-
-    # Validar que haya insumos asignados a la clase
-    if not insumos_asignados.exists():
-        return
-
-    # Obtener números totales de alumnos y participantes
-    total_alumnos_clase = clase.asignatura.alumnos.count()  # Número total de alumnos en la asignatura
-    total_participantes = participantes.count()
-
-    if total_participantes == 0:
-        # Si no hay participantes, no se realiza la distribución
-        return
+    return set(serializador.fields), serializador.expandidos
 
-    for insumo_asignado in insumos_asignados:
-        # Calcular la cantidad total disponible para el insumo
-        cantidad_total = insumo_asignado.cantidad
-
-        # Evitar divisiones por cero si no hay alumnos asignados a la clase
-        if total_alumnos_clase == 0:
-            continue
-
-        # Calcular la cantidad asignable por alumno
-        cantidad_por_alumno = cantidad_total / Decimal(total_alumnos_clase)
-
-        # Distribuir entre los participantes
-        for participacion in participantes:
-            alumno = participacion.alumno
-            distribucion, created = ClaseDistribucion.objects.get_or_create(
-                clase=clase,
-                alumno=alumno,
-                insumo=insumo_asignado.insumo,
-                defaults={"cantidad_asignada": round(cantidad_por_alumno, 2)}
-            )
-            if not created:
-                distribucion.cantidad_asignada = round(cantidad_por_alumno, 2)
-                distribucion.save()
-
-        # Calcular la cantidad restante no distribuida
-        cantidad_distribuida = cantidad_por_alumno * Decimal(total_participantes)
-        cantidad_restante = cantidad_total - cantidad_distribuida
-
-        # Actualizar la cantidad restante en el insumo de la clase
-        insumo_asignado.cantidad = max(cantidad_restante, 0)
-        insumo_asignado.save()
 
+# Reporte de insumos: filas leídas por lote al transmitir y tope de filas por página
+TAMANO_LOTE_REPORTE = 2000
+LIMITE_MAXIMO_REPORTE = 5000
+COLUMNAS_REPORTE_INSUMOS = [
+    "id", "insumo", "asignatura", "clase", "cantidad_total", "cantidad_utilizada", "cantidad_devuelta", "cantidad_extra",
+]
 
 
 class AsignaturaView(viewsets.ModelViewSet):
     serializer_class = AsignaturaSerializer
     permission_classes = [IsAuthenticated]
+    orden_paginacion = ('id',)  # Las @action de reportes indican su propio orden
 
 
     def get_queryset(self):
         user = self.request.user
         # Si el usuario es profesor, mostramos solo sus asignaturas
         if user.rol == "2":  # Rol de profesor
-            return Asignatura.objects.filter(profesor=user)
+            queryset = Asignatura.objects.filter(profesor=user)
         elif user.rol == "3":  # Rol de alumno
-            return Asignatura.objects.filter(alumnos=user)  # Filtra por alumnos asignados
+            queryset = Asignatura.objects.filter(alumnos=user)  # Filtra por alumnos asignados
         elif user.rol == "1":  # Rol de administrador
-            return Asignatura.objects.all()
-        # Si el usuario no es admin, profesor ni alumno, no devuelve asignaturas
-        return Asignatura.objects.none()
+            queryset = Asignatura.objects.all()
+        else:
+            # Si el usuario no es admin, profesor ni alumno, no devuelve asignaturas
+            return Asignatura.objects.none()
+
+        if self.action in ('list', 'retrieve'):
+            # Profesor, cantidad de alumnos y alumnos resueltos en consultas fijas, solo los campos pedidos
+            return queryset.con_detalle(*campos_serializador(self.get_serializer()))
+        return queryset
 
     
     @action(detail=True, methods=['get'], url_path='clases')
@@ -102,14 +86,15 @@ class AsignaturaView(viewsets.ModelViewSet):
         if request.user.rol == "2" and asignatura.profesor != request.user:
             raise PermissionDenied("No tienes permiso para ver estas clases.")
 
-        clases = Clase.objects.filter(asignatura=asignatura)
+        campos = campos_serializador(ClaseSerializer(context={'request': request}))
+        clases = Clase.objects.filter(asignatura=asignatura).con_detalle(request.user, *campos)
         
         # Pasar el contexto del request al serializador
         serializer = ClaseSerializer(clases, many=True, context={'request': request})
 
         return Response({
             'clases': serializer.data,
-            'numero_clases': clases.count()
+            'numero_clases': len(clases)  # El queryset ya fue evaluado por el serializador
         })
 
     @action(detail=True, methods=['post'], url_path='agregar_clase')
@@ -143,15 +128,10 @@ class AsignaturaView(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """
-        Crea la asignatura y añade al menos una clase por defecto.
+        Crea la asignatura con al menos una clase por defecto.
+        Las clases las crea el signal `crear_clases` en un solo INSERT.
         """
-        asignatura = serializer.save()
-        if asignatura.clase_set.count() == 0:
-            Clase.objects.create(
-                asignatura=asignatura,
-                nombre="Clase 1",
-                profesor=asignatura.profesor
-            )
+        serializer.save(numero_clases=max(serializer.validated_data.get('numero_clases') or 0, 1))
 
     def update(self, request, *args, **kwargs):
         """
@@ -179,62 +159,78 @@ class AsignaturaView(viewsets.ModelViewSet):
         clases = Clase.objects.filter(asignatura=asignatura)
 
         with transaction.atomic():  # Aseguramos la consistencia en caso de errores
-            for clase in clases:
-                if clase.estado not in ["iniciada", "finalizada"]:
-                    # Devolver insumos al inventario general
-                    insumos_clase = ClaseInsumo.objects.filter(clase=clase)
-                    for insumo_clase in insumos_clase:
-                        insumo = insumo_clase.insumo
-                        insumo.cantidad_total += insumo_clase.cantidad  # Devolver la cantidad asignada
-                        insumo.save()
-                        insumo_clase.delete()  # Eliminar la relación ClaseInsumo
-
-                # Eliminar la clase
-                clase.delete()
+            # Devolver insumos al inventario general de todas las clases que no estén iniciadas ni finalizadas
+            devolver_insumos(
+                ClaseInsumo.objects.filter(clase__asignatura=asignatura)
+                .exclude(clase__estado__in=["iniciada", "finalizada"])
+            )
+
+            # Eliminar las clases
+            clases.delete()
 
             # Eliminar la asignatura
             self.perform_destroy(asignatura)
 
         return Response({"status": "Asignatura eliminada correctamente"}, status=status.HTTP_204_NO_CONTENT)
     
-    @action(detail=True, methods=['get'], url_path='reporte_participacion', permission_classes=[IsAdmin])
+    @action(detail=True, methods=['get'], url_path='reporte_participacion', permission_classes=[IsAdmin], renderer_classes=RENDERERS_CON_CSV)
+    @cachear_reporte('participacion', alcance=lambda request, pk=None: pk)
     def reporte_participacion(self, request, pk=None):
         """
         Reporte de participación de alumnos en una asignatura.
+        Las participaciones se cuentan con una sola consulta agrupada por alumno;
+        con `?format=csv` el reporte se envía en streaming.
         """
         asignatura = self.get_object()
-        alumnos = asignatura.alumnos.all()
+        total_clases = asignatura.clase_set.count()
 
-        data = []
-        for alumno in alumnos:
-            total_clases = asignatura.clase_set.count()
-            clases_participadas = ClaseParticipacion.objects.filter(clase__asignatura=asignatura, alumno=alumno).count()
+        alumnos = asignatura.alumnos.annotate(
+            clases_participadas=Count(
+                'participaciones', filter=Q(participaciones__clase__asignatura=asignatura)
+            )
+        ).values('id', 'nombre', 'email', 'clases_participadas').order_by('id')
 
-            porcentaje_participacion = (
-                (clases_participadas / total_clases) * 100 if total_clases > 0 else 0
+        def filas(alumnos):
+            for alumno in alumnos:
+                clases_participadas = alumno['clases_participadas']
+                porcentaje_participacion = (
+                    (clases_participadas / total_clases) * 100 if total_clases > 0 else 0
+                )
+                yield {
+                    "alumno": alumno['nombre'],
+                    "email": alumno['email'],
+                    "participacion": porcentaje_participacion,
+                    "clases_participadas": clases_participadas,
+                    "total_clases": total_clases
+                }
+
+        if request.accepted_renderer.format == 'csv':
+            return respuesta_csv(
+                filas(alumnos.iterator(chunk_size=500)),
+                ["alumno", "email", "participacion", "clases_participadas", "total_clases"],
+                f"participacion_asignatura_{asignatura.id}.csv",
             )
-            data.append({
-                "alumno": alumno.nombre,
-                "email": alumno.email,
-                "participacion": porcentaje_participacion,
-                "clases_participadas": clases_participadas,
-                "total_clases": total_clases
-            })
 
-        return Response({"participacion": data}, status=status.HTTP_200_OK)
+        return self.get_paginated_response(list(filas(self.paginate_queryset(alumnos))))
     
-    @action(detail=False, methods=['get'], url_path='reporte_participacion_general', permission_classes=[IsAdmin])
+    @action(detail=False, methods=['get'], url_path='reporte_participacion_general', permission_classes=[IsAdmin], orden_paginacion='id')
+    @cachear_reporte('participacion_general')
     def reporte_participacion_general(self, request):
         """
         Reporte de participación por asignatura para todos los alumnos.
+        Lee los totales de ParticipacionResumen en una sola consulta.
         """
-        asignaturas = Asignatura.objects.prefetch_related("clase_set", "alumnos").all()
+        asignaturas = Asignatura.objects.select_related("profesor").annotate(
+            total_clases=SubconsultaConteo(Clase.objects.filter(asignatura=OuterRef('pk')).values('id')),
+            total_alumnos=Count("resumenes_participacion"),
+            total_participaciones=Coalesce(Sum("resumenes_participacion__clases_participadas"), 0),
+        )
 
         data = []
-        for asignatura in asignaturas:
-            total_clases = asignatura.clase_set.count()
-            total_participaciones = ClaseParticipacion.objects.filter(clase__asignatura=asignatura).count()
-            total_alumnos = asignatura.alumnos.count()
+        for asignatura in self.paginate_queryset(asignaturas):
+            total_clases = asignatura.total_clases
+            total_participaciones = asignatura.total_participaciones
+            total_alumnos = asignatura.total_alumnos
 
             porcentaje_general = (
                 (total_participaciones / (total_clases * total_alumnos)) * 100
@@ -251,12 +247,14 @@ class AsignaturaView(viewsets.ModelViewSet):
                 "total_participaciones": total_participaciones
             })
 
-        return Response({"reporte": data}, status=status.HTTP_200_OK)
+        return self.get_paginated_response(data)
 
-    @action(detail=False, methods=['get'], url_path='reporte_participacion_alumno', permission_classes=[IsAuthenticated])
+    @action(detail=False, methods=['get'], url_path='reporte_participacion_alumno', permission_classes=[IsAuthenticated], orden_paginacion='asignatura_id')
+    @cachear_reporte('participacion_alumno', alcance=lambda request: request.query_params.get('alumno_id'))
     def reporte_participacion_alumno(self, request):
         """
         Reporte de participación del alumno en todas las asignaturas.
+        Lee los resúmenes del alumno en ParticipacionResumen en una sola consulta.
         """
         alumno_id = request.query_params.get('alumno_id')
         if not alumno_id:
@@ -267,25 +265,25 @@ class AsignaturaView(viewsets.ModelViewSet):
         except Usuario.DoesNotExist:
             return Response({"error": "Alumno no encontrado o no es un alumno."}, status=status.HTTP_404_NOT_FOUND)
 
-        asignaturas = alumno.asignaturas_cursadas.all()
+        resumenes = ParticipacionResumen.objects.filter(alumno=alumno).select_related("asignatura")
         data = []
 
-        for asignatura in asignaturas:
-            total_clases = asignatura.clase_set.count()
-            clases_participadas = ClaseParticipacion.objects.filter(clase__asignatura=asignatura, alumno=alumno).count()
+        for resumen in self.paginate_queryset(resumenes):
+            total_clases = resumen.total_clases
+            clases_participadas = resumen.clases_participadas
 
             porcentaje_participacion = (
                 (clases_participadas / total_clases) * 100 if total_clases > 0 else 0
             )
 
             data.append({
-                "asignatura": asignatura.nombre,
+                "asignatura": resumen.asignatura.nombre,
                 "porcentaje_participacion": round(porcentaje_participacion, 2),
                 "clases_participadas": clases_participadas,
                 "total_clases": total_clases,
             })
 
-        return Response({"participacion": data}, status=status.HTTP_200_OK)
+        return self.get_paginated_response(data)
 
 
 
@@ -296,16 +294,19 @@ class ClaseViewSet(viewsets.ModelViewSet):
     serializer_class = ClaseSerializer
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Conteos, participación del usuario y relaciones resueltos en consultas fijas
+            return queryset.con_detalle(self.request.user, *campos_serializador(self.get_serializer()))
+        return queryset
+
+    @method_decorator(condition(etag_func=etag_clase))
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, context={'request': request})
         return Response(serializer.data)
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
-    
     @action(detail=True, methods=['post'], permission_classes=[IsProfesor])
     def cambiar_estado(self, request, pk=None):
         """
@@ -320,15 +321,17 @@ class ClaseViewSet(viewsets.ModelViewSet):
 
         # Verificar la transición de estado
         if (clase.estado == 'asignada' and nuevo_estado == 'iniciada') or (clase.estado == 'iniciada' and nuevo_estado == 'finalizada'):
-            clase.estado = nuevo_estado
-            clase.save()
-
             # Agregar la lógica de distribuir insumos si el estado cambia a 'iniciada'
-            if nuevo_estado == 'iniciada':
-                try:
-                    distribuir_insumos(clase)  # Asegúrate de que esta función está correctamente definida
-                except Exception as e:
-                    return Response({'error': f'Error al distribuir insumos: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            try:
+                with transaction.atomic():
+                    clase.estado = nuevo_estado
+                    clase.save()
+                    if nuevo_estado == 'iniciada':
+                        cantidades = distribuir_insumos(clase)
+                        # La tabla de cuotas parte de las mismas cantidades asignadas que el reparto
+                        construir_tabla_cuotas(clase, cantidades)
+            except Exception as e:
+                return Response({'error': f'Error al distribuir insumos: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
             return Response({'status': 'Estado actualizado'}, status=status.HTTP_200_OK)
 
@@ -348,46 +351,10 @@ class ClaseViewSet(viewsets.ModelViewSet):
         if not insumos_data:
             return Response({'error': 'No se han proporcionado insumos para asignar.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        errores = []
-        with transaction.atomic():
-            for insumo_data in insumos_data:
-                insumo_id = insumo_data.get('insumo_id')
-                cantidad = insumo_data.get('cantidad')
-
-                # Validar que insumo_id sea un número entero y cantidad sea un número positivo
-                if not isinstance(insumo_id, int) or not isinstance(cantidad, (int, float, Decimal)) or cantidad <= 0:
-                    errores.append(f"Datos inválidos para insumo: {insumo_data}")
-                    continue
-
-                try:
-                    insumo = Insumo.objects.get(id=insumo_id)
-
-                    # Convertir cantidad a Decimal
-                    cantidad = Decimal(str(cantidad))
-
-                    if insumo.cantidad_total >= cantidad:
-                        # Actualizar inventario y asignar insumo
-                        insumo.cantidad_total -= cantidad
-                        insumo.save()
-
-                        # Actualizar o crear ClaseInsumo
-                        clase_insumo, created = ClaseInsumo.objects.get_or_create(
-                            clase=clase,
-                            insumo=insumo,
-                            defaults={'cantidad': cantidad},
-                        )
-                        if not created:
-                            clase_insumo.cantidad += cantidad
-                            clase_insumo.save()
-                    else:
-                        errores.append(f"Cantidad insuficiente para el insumo '{insumo.nombre}'. Disponible: {insumo.cantidad_total}. Solicitado: {cantidad}.")
-                except Insumo.DoesNotExist:
-                    errores.append(f"Insumo con ID {insumo_id} no encontrado.")
-                except Exception as e:
-                    errores.append(f"Error procesando el insumo con ID {insumo_id}: {str(e)}")
-
-            if errores:
-                return Response({'error': 'Algunos insumos no pudieron asignarse', 'detalles': errores}, status=status.HTTP_400_BAD_REQUEST)
+        # Reservar todos los insumos en bloque (todo o nada)
+        errores = reservar_insumos(clase, insumos_data)
+        if errores:
+            return Response({'error': 'Algunos insumos no pudieron asignarse', 'detalles': errores}, status=status.HTTP_400_BAD_REQUEST)
 
         clase.estado = 'asignada'
         clase.insumos_asignados = True
@@ -399,55 +366,6 @@ class ClaseViewSet(viewsets.ModelViewSet):
 
 
     
-    @action(detail=True, methods=['get'], url_path='insumos_asignados')
-    def insumos_asignados(self, request, pk=None):
-        """
-        Devuelve los insumos asignados a una clase, incluyendo cantidad total asignada,
-        cantidad repartida y cantidad restante.
-        """
-        clase = self.get_object()
-
-        # Crear un diccionario para mapear las unidades de medida
-        unidad_medida_dict = dict(Insumo.MEDIDAS)  # Convertir choices a un diccionario
-
-        # Obtener todos los insumos asignados a la clase
-        insumos = ClaseInsumo.objects.filter(clase=clase)
-
-        # Construir la respuesta con cálculos de cantidades
-        insumos_data = []
-        for insumo_clase in insumos:
-            # Calcular la cantidad repartida, excluyendo las aprobaciones extraordinarias
-            cantidad_repartida = (
-                ClaseDistribucion.objects.filter(
-                    clase=clase,
-                    insumo=insumo_clase.insumo,
-                    alumno__isnull=False  # Excluir cualquier distribución genérica o extraordinaria
-                )
-                .aggregate(total=Sum('cantidad_asignada'))['total'] or 0
-            )
-
-            # Calcular la cantidad restante
-            cantidad_restante = insumo_clase.cantidad - cantidad_repartida
-
-            # Prevenir resultados negativos en cantidad restante
-            cantidad_restante = max(0, cantidad_restante)
-
-            # Agregar los datos del insumo a la respuesta
-            insumos_data.append({
-                'id': insumo_clase.insumo.id,
-                'nombre': insumo_clase.insumo.nombre,
-                'unidad_medida': unidad_medida_dict.get(insumo_clase.insumo.unidad_medida, "Desconocido"),
-                'total_cantidad': insumo_clase.cantidad,  # Cantidad total asignada a la clase
-                'cantidad_repartida': round(cantidad_repartida, 2),  # Cantidad distribuida entre alumnos
-                'cantidad_restante': round(cantidad_restante, 2),  # Cantidad aún no distribuida
-            })
-
-        return Response({'insumos': insumos_data}, status=status.HTTP_200_OK)
-
-
-
-
-    
     @action(detail=True, methods=['post'], url_path='quitar_insumos')
     def quitar_insumos(self, request, pk=None):
         """
@@ -497,9 +415,8 @@ class ClaseViewSet(viewsets.ModelViewSet):
                         cantidad_restante = Decimal(0)
 
                 # Actualizar el inventario general del insumo
-                insumo = Insumo.objects.get(id=insumo_id)
-                insumo.cantidad_total += cantidad_a_quitar
-                insumo.save()
+                if not Insumo.objects.ajustar_stock({insumo_id: cantidad_a_quitar}, 'devolucion', clase=clase):
+                    raise Insumo.DoesNotExist
 
                 return Response({'status': 'Insumo actualizado correctamente.'}, status=status.HTTP_200_OK)
 
@@ -532,34 +449,9 @@ class ClaseViewSet(viewsets.ModelViewSet):
             if clase.estado != "iniciada":
                 return Response({"error": "La clase no está iniciada. No puedes participar todavía."}, status=status.HTTP_400_BAD_REQUEST)
 
-            with transaction.atomic():
-                # Crear participación si no existe
-                participacion, created = ClaseParticipacion.objects.get_or_create(clase=clase, alumno=alumno)
-
-                if not created:
-                    return Response({"status": "Ya estás participando en esta clase."}, status=status.HTTP_200_OK)
-
-                # Obtener insumos asignados a la clase
-                insumos_clase = ClaseInsumo.objects.filter(clase=clase)
-
-                # Total de alumnos asignados a la asignatura
-                total_alumnos = clase.asignatura.alumnos.count()
-
-                for insumo_clase in insumos_clase:
-                    # Cantidad asignada por alumno
-                    cantidad_por_alumno = insumo_clase.cantidad / Decimal(total_alumnos)
-
-                    # Verificar si ya se distribuyó al alumno
-                    distribucion, created = ClaseDistribucion.objects.get_or_create(
-                        clase=clase,
-                        alumno=alumno,
-                        insumo=insumo_clase.insumo,
-                        defaults={"cantidad_asignada": cantidad_por_alumno},
-                    )
-
-                    if created:
-                        distribucion.cantidad_asignada = cantidad_por_alumno
-                        distribucion.save()
+            # Registrar participación y distribuciones a partir de la tabla de cuotas de la clase
+            if not registrar_participacion(clase, alumno):
+                return Response({"status": "Ya estás participando en esta clase."}, status=status.HTTP_200_OK)
 
             return Response({"status": "Participación registrada y los insumos se distribuyeron correctamente."}, status=status.HTTP_200_OK)
 
@@ -585,50 +477,22 @@ class ClaseViewSet(viewsets.ModelViewSet):
 
         with transaction.atomic():  # Asegurar consistencia
             # Devolver insumos al inventario general
-            insumos_clase = ClaseInsumo.objects.filter(clase=clase)
-            for insumo_clase in insumos_clase:
-                insumo = insumo_clase.insumo
-                insumo.cantidad_total += insumo_clase.cantidad  # Devolver la cantidad asignada
-                insumo.save()
-                insumo_clase.delete()  # Eliminar la relación ClaseInsumo
+            devolver_insumos(ClaseInsumo.objects.filter(clase=clase), clase=clase)
 
             # Eliminar la clase
             self.perform_destroy(clase)
 
         return Response({"status": "Clase eliminada correctamente"}, status=status.HTTP_204_NO_CONTENT)
     
-    @action(detail=True, methods=['get'], url_path='mis_insumos', permission_classes=[IsEstudiante])
-    def mis_insumos(self, request, pk=None):
-        """
-        Devuelve los insumos distribuidos a un alumno en una clase específica.
-        """
-        clase = self.get_object()
-        alumno = request.user
-
-        # Validar que el usuario sea un alumno
-        if alumno.rol != "3":
-            return Response({"error": "Solo los alumnos pueden consultar sus insumos."}, status=status.HTTP_403_FORBIDDEN)
-
-        distribuciones = ClaseDistribucion.objects.filter(clase=clase, alumno=alumno)
-
-        data = [
-            {
-                "insumo": distribucion.insumo.nombre,
-                "cantidad_asignada": distribucion.cantidad_asignada,
-                "cantidad_extra_asignada": distribucion.cantidad_extra_asignada,  # Asegúrate de incluir este campo
-                "unidad_medida": distribucion.insumo.get_unidad_medida_display(),
-            }
-            for distribucion in distribuciones
-        ]
-
-        return Response({"insumos": data}, status=status.HTTP_200_OK)
-
     @action(detail=True, methods=['post'], url_path='finalizar_clase', permission_classes=[IsProfesor])
     def finalizar_clase(self, request, pk=None):
         """
         Finaliza una clase, devolviendo los insumos no utilizados al inventario general
         y registrando el historial de la clase y los insumos asignados a los alumnos.
         Además, rechaza las solicitudes pendientes al finalizar la clase.
+
+        Con `?async=1` el trabajo se encola y se responde de inmediato con el id de la tarea,
+        cuyo avance se consulta en `subjects/jobs/<id>/`.
         """
         clase = self.get_object()
 
@@ -638,76 +502,15 @@ class ClaseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            with transaction.atomic():
-                insumos_clase = ClaseInsumo.objects.filter(clase=clase)
-
-                # Registrar los insumos asignados a los alumnos
-                distribuciones = ClaseDistribucion.objects.filter(clase=clase)
-                for distribucion in distribuciones:
-                    # Registrar la cantidad asignada y la cantidad extra por separado
-                    ClaseAlumnoInsumoHistorial.objects.create(
-                        clase=clase,
-                        alumno=distribucion.alumno,
-                        insumo=distribucion.insumo,
-                        cantidad_asignada=distribucion.cantidad_asignada,
-                        cantidad_extra_asignada=distribucion.cantidad_extra_asignada or 0  # Asegurarnos de que no sea None
-                    )
-
-                for insumo_clase in insumos_clase:
-                    # Cantidad total asignada a la clase
-                    cantidad_total_asignada = insumo_clase.cantidad
-
-                    # Cantidad distribuida entre los alumnos
-                    cantidad_distribuida = ClaseDistribucion.objects.filter(
-                        clase=clase, insumo=insumo_clase.insumo
-                    ).aggregate(total=Sum('cantidad_asignada'))['total'] or 0
-
-                    # Cantidad extra distribuida entre los alumnos
-                    cantidad_extra_distribuida = ClaseDistribucion.objects.filter(
-                        clase=clase, insumo=insumo_clase.insumo
-                    ).aggregate(total=Sum('cantidad_extra_asignada'))['total'] or 0
-
-                    # Cantidad no utilizada (asegurarnos de que no sea negativa)
-                    cantidad_no_utilizada = max(cantidad_total_asignada - cantidad_distribuida, 0)
-
-                    # Registrar en el historial general
-                    ClaseInsumoHistorial.objects.create(
-                        clase=clase,
-                        insumo=insumo_clase.insumo,
-                        cantidad_total_asignada=cantidad_total_asignada,
-                        cantidad_utilizada=cantidad_distribuida,
-                        cantidad_devuelta=cantidad_no_utilizada,
-                        cantidad_extra_asignada=cantidad_extra_distribuida
-                    )
-
-                    # Devolver al inventario general solo lo no utilizado
-                    if cantidad_no_utilizada > 0:
-                        insumo_clase.insumo.cantidad_total += cantidad_no_utilizada
-                        insumo_clase.insumo.save()
-
-                    # Eliminar el insumo asignado a la clase
-                    insumo_clase.delete()
-
-                # Eliminar las distribuciones después de registrarlas en el historial
-                distribuciones.delete()
-
-                # Rechazar solicitudes pendientes
-                solicitudes_pendientes = SolicitudInsumo.objects.filter(clase=clase, estado="pendiente")
-                for solicitud in solicitudes_pendientes:
-                    solicitud.estado = "rechazado"
-                    solicitud.motivo_rechazo = "La clase ha finalizado."
-                    solicitud.save()
-
-                    # Crear notificación para el alumno
-                    Notificacion.objects.create(
-                        usuario=solicitud.alumno,
-                        mensaje=f"Tu solicitud de {solicitud.cantidad_solicitada} {solicitud.insumo.nombre} ha sido rechazada porque la clase ha finalizado.",
-                    )
+        if request.query_params.get("async") in ("1", "true"):
+            tarea = encolar_finalizacion(clase, request.user)
+            return Response(
+                {"status": "Finalización de la clase en proceso.", "tarea": TareaSerializer(tarea).data},
+                status=status.HTTP_202_ACCEPTED
+            )
 
-                # Cambiar el estado de la clase
-                clase.estado = "finalizada"
-                clase.save()
+        try:
+            cerrar_clase(clase)
 
             return Response(
                 {"status": "Clase finalizada. Historial de insumos asignados y utilizados registrado. Solicitudes pendientes rechazadas."},
@@ -804,156 +607,203 @@ class ClaseViewSet(viewsets.ModelViewSet):
         if not isinstance(solicitudes, list):
             return Response({"error": "Las solicitudes deben ser un arreglo."}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Resolver los insumos por nombre con el catálogo en memoria y traer las
+        # distribuciones del alumno para todos ellos en una sola consulta
+        ids_insumos = {
+            solicitud.get('insumoId'): id_insumo_por_nombre(solicitud.get('insumoId'))
+            for solicitud in solicitudes
+        }
+        distribuciones = {
+            distribucion.insumo_id: distribucion
+            for distribucion in ClaseDistribucion.objects.filter(
+                clase=clase, alumno=alumno, insumo_id__in=[id_insumo for id_insumo in ids_insumos.values() if id_insumo]
+            )
+        }
+
         respuestas = []
+        nuevas = []
         for solicitud in solicitudes:
             insumo_id = solicitud.get('insumoId')
             cantidad_solicitada = Decimal(solicitud.get('cantidadSolicitada', 0))
+            id_insumo = ids_insumos[insumo_id]
 
-            try:
-                insumo = Insumo.objects.get(nombre=insumo_id)
-
-                if cantidad_solicitada <= 0:
-                    respuestas.append({"insumoId": insumo_id, "error": "Cantidad solicitada inválida."})
-                    continue
-
-                # Verificar la cantidad asignada al alumno
-                distribucion = ClaseDistribucion.objects.filter(
-                    clase=clase, alumno=alumno, insumo=insumo
-                ).first()
-
-                if not distribucion:
-                    respuestas.append({"insumoId": insumo_id, "error": "No tienes insumos asignados de este tipo."})
-                    continue
-
-                if cantidad_solicitada > distribucion.cantidad_asignada:
-                    respuestas.append({"insumoId": insumo_id, "error": "La cantidad solicitada excede tu asignación."})
-                    continue
-
-                # Crear la solicitud con estado "pendiente"
-                SolicitudInsumo.objects.create(
-                    alumno=alumno,
-                    clase=clase,
-                    insumo=insumo,
-                    cantidad_solicitada=cantidad_solicitada,
-                    estado="pendiente"
-                )
-                respuestas.append({"insumoId": insumo_id, "status": "Solicitud creada correctamente."})
-
-            except Insumo.DoesNotExist:
+            if id_insumo is None:
                 respuestas.append({"insumoId": insumo_id, "error": "El insumo solicitado no existe."})
+                continue
+
+            if cantidad_solicitada <= 0:
+                respuestas.append({"insumoId": insumo_id, "error": "Cantidad solicitada inválida."})
+                continue
+
+            # Verificar la cantidad asignada al alumno
+            distribucion = distribuciones.get(id_insumo)
+
+            if not distribucion:
+                respuestas.append({"insumoId": insumo_id, "error": "No tienes insumos asignados de este tipo."})
+                continue
+
+            if cantidad_solicitada > distribucion.cantidad_asignada:
+                respuestas.append({"insumoId": insumo_id, "error": "La cantidad solicitada excede tu asignación."})
+                continue
+
+            # Solicitud con estado "pendiente"; se crean todas juntas al final
+            nuevas.append(SolicitudInsumo(
+                alumno=alumno,
+                clase=clase,
+                insumo_id=id_insumo,
+                cantidad_solicitada=cantidad_solicitada,
+                estado="pendiente"
+            ))
+            respuestas.append({"insumoId": insumo_id, "status": "Solicitud creada correctamente."})
+
+        SolicitudInsumo.objects.bulk_create(nuevas)
 
         return Response(respuestas, status=status.HTTP_200_OK)
 
     
-    @action(detail=False, methods=['get'], url_path='reporte_insumos', permission_classes=[IsAdmin])
+    @action(detail=False, methods=['get'], url_path='reporte_insumos', permission_classes=[IsAdmin], renderer_classes=RENDERERS_CON_EXPORTACION)
+    @cachear_reporte('insumos')
     def reporte_insumos(self, request):
         """
         Reporte de historial de insumos con datos agregados.
+
+        Se pagina por clave (`?limite=N` y `?despues_de=<id>`, el id del último registro
+        recibido); la respuesta incluye `siguiente` con el valor para pedir la página siguiente.
+        Con `?format=ndjson` o `?format=csv` el historial se envía en streaming, por lotes,
+        y sin `limite` se exporta completo.
         """
-        historial = ClaseInsumoHistorial.objects.select_related('clase', 'clase__asignatura', 'insumo')
-        data = [
-            {
-                "insumo": registro.insumo.nombre,
-                "asignatura": registro.clase.asignatura.nombre,
-                "clase": registro.clase.nombre,
-                "cantidad_total": registro.cantidad_total_asignada,
-                "cantidad_utilizada": registro.cantidad_utilizada,
-                "cantidad_devuelta": registro.cantidad_devuelta,
-                "cantidad_extra": registro.cantidad_extra_asignada
-            }
-            for registro in historial
-        ]
-        return Response({"historial": data}, status=status.HTTP_200_OK)
+        try:
+            despues_de = int(request.query_params.get('despues_de', 0))
+            limite = request.query_params.get('limite')
+            limite = min(int(limite), LIMITE_MAXIMO_REPORTE) if limite else None
+        except ValueError:
+            return Response({"error": "Los parámetros 'despues_de' y 'limite' deben ser enteros."}, status=status.HTTP_400_BAD_REQUEST)
+        if limite is not None and limite <= 0:
+            return Response({"error": "El parámetro 'limite' debe ser mayor que cero."}, status=status.HTTP_400_BAD_REQUEST)
+
+        historial = ClaseInsumoHistorial.objects.filter(id__gt=despues_de).order_by('id').values(
+            'id', 'insumo__nombre', 'clase__asignatura__nombre', 'clase__nombre', 'cantidad_total_asignada',
+            'cantidad_utilizada', 'cantidad_devuelta', 'cantidad_extra_asignada',
+        )
+
+        def filas(registros):
+            for registro in registros:
+                yield {
+                    "id": registro['id'],
+                    "insumo": registro['insumo__nombre'],
+                    "asignatura": registro['clase__asignatura__nombre'],
+                    "clase": registro['clase__nombre'],
+                    "cantidad_total": registro['cantidad_total_asignada'],
+                    "cantidad_utilizada": registro['cantidad_utilizada'],
+                    "cantidad_devuelta": registro['cantidad_devuelta'],
+                    "cantidad_extra": registro['cantidad_extra_asignada']
+                }
+
+        formato = request.accepted_renderer.format
+        if formato in ('csv', 'ndjson'):
+            if limite is not None:
+                historial = historial[:limite]
+            registros = filas(historial.iterator(chunk_size=TAMANO_LOTE_REPORTE))
+            if formato == 'csv':
+                return respuesta_csv(registros, COLUMNAS_REPORTE_INSUMOS, "reporte_insumos.csv")
+            return respuesta_ndjson(registros, "reporte_insumos.ndjson")
+
+        # Sin `limite` la respuesta JSON también se acota, a una página del tamaño por defecto
+        limite = limite or PaginacionCursor.page_size
+        data = list(filas(historial[:limite]))
+        siguiente = data[-1]["id"] if len(data) == limite else None
+        return Response({"historial": data, "siguiente": siguiente}, status=status.HTTP_200_OK)
 
 
 
 class SolicitudInsumoViewSet(viewsets.ModelViewSet):
     queryset = SolicitudInsumo.objects.all()
     serializer_class = SolicitudInsumoSerializer
+    orden_paginacion = ('-creado_en', '-id')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Traer en la misma consulta solo las relaciones que leen los campos pedidos
+            campos, expandidos = campos_serializador(self.get_serializer())
+            relaciones = {'alumno': 'alumno_nombre', 'clase': 'clase_nombre', 'insumo': None}
+            return queryset.select_related(*[
+                relacion for relacion, campo in relaciones.items()
+                if relacion in expandidos or (campo is not None and campo in campos)
+            ])
+        return queryset
 
     @action(detail=True, methods=['post'], url_path='gestionar_solicitud', permission_classes=[IsAuthenticated])
     def gestionar_solicitud(self, request, pk=None):
         """
         Gestiona la solicitud de insumo (aprobar o rechazar).
+
+        Cada cambio de estado es un UPDATE condicionado al estado esperado
+        (SolicitudInsumo.objects.transicionar): si otro usuario gestionó la solicitud
+        al mismo tiempo, el UPDATE no afecta ninguna fila y se responde como si la
+        solicitud ya no estuviera en ese estado, sin repetir la aprobación.
         """
         try:
-            solicitud = SolicitudInsumo.objects.get(id=pk)
+            solicitud = SolicitudInsumo.objects.select_related('insumo').get(id=pk)
 
             accion = request.data.get("accion")  # "aprobar" o "rechazar"
             user = request.user
 
             if user.rol == "2":  # Profesor
-                if solicitud.estado != "pendiente":
-                    return Response({"error": "Solo puedes gestionar solicitudes en estado 'pendiente'."}, status=status.HTTP_403_FORBIDDEN)
-
-                if accion == "aprobar":
-                    # Cambiar estado a pendiente_admin
-                    solicitud.estado = "pendiente_admin"
-                    solicitud.save()
-                    return Response({"status": "Solicitud aprobada por el profesor y enviada al administrador."}, status=status.HTTP_200_OK)
-
-                elif accion == "rechazar":
-                    # Cambiar estado a rechazado y notificar al alumno
-                    solicitud.estado = "rechazado"
-                    solicitud.motivo_rechazo = request.data.get("motivo", "Sin motivo proporcionado.")
-                    solicitud.save()
-
-                    Notificacion.objects.create(
-                        usuario=solicitud.alumno,
-                        mensaje=f"Tu solicitud de {solicitud.cantidad_solicitada} {solicitud.insumo.nombre} ha sido rechazada por el profesor."
-                    )
-                    return Response({"status": "Solicitud rechazada por el profesor."}, status=status.HTTP_200_OK)
-
+                desde, quien = "pendiente", "el profesor"
             elif user.rol == "1":  # Administrador
-                if solicitud.estado != "pendiente_admin":
-                    return Response({"error": "Solo puedes gestionar solicitudes en estado 'pendiente_admin'."}, status=status.HTTP_403_FORBIDDEN)
-
-                if accion == "aprobar":
-                    cantidad_aprobada = solicitud.cantidad_solicitada
-
-                    if solicitud.insumo.cantidad_total < cantidad_aprobada:
-                        return Response(
-                            {"error": f"Inventario general insuficiente. Disponible: {solicitud.insumo.cantidad_total}, solicitado: {cantidad_aprobada}."},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                    # Reducir del inventario general
-                    solicitud.insumo.cantidad_total -= cantidad_aprobada
-                    solicitud.insumo.save()
-
-                    # Registrar como cantidad extra asignada al alumno
-                    distribucion, created = ClaseDistribucion.objects.get_or_create(
-                        clase=solicitud.clase,
-                        alumno=solicitud.alumno,
-                        insumo=solicitud.insumo,
-                        defaults={"cantidad_asignada": 0, "cantidad_extra_asignada": 0}
+                desde, quien = "pendiente_admin", "el administrador"
+            else:
+                return Response({"error": "Acción inválida. Debe ser 'aprobar' o 'rechazar'."}, status=status.HTTP_400_BAD_REQUEST)
+
+            estado_invalido = Response({"error": f"Solo puedes gestionar solicitudes en estado '{desde}'."}, status=status.HTTP_403_FORBIDDEN)
+            if solicitud.estado != desde:
+                return estado_invalido
+
+            if accion == "rechazar":
+                # Cambiar estado a rechazado y notificar al alumno
+                motivo = request.data.get("motivo", "Sin motivo proporcionado.")
+                with transaction.atomic():
+                    if not SolicitudInsumo.objects.transicionar(solicitud.id, desde, "rechazado", motivo_rechazo=motivo):
+                        return estado_invalido
+
+                    notificar_varios(
+                        [solicitud.alumno_id],
+                        f"Tu solicitud de {solicitud.cantidad_solicitada} {solicitud.insumo.nombre} ha sido rechazada por {quien}."
                     )
-                    distribucion.cantidad_extra_asignada += cantidad_aprobada
-                    distribucion.save()
+                return Response({"status": f"Solicitud rechazada por {quien}."}, status=status.HTTP_200_OK)
 
-                    # Cambiar estado a aprobado y notificar al alumno
-                    solicitud.estado = "aprobado"
-                    solicitud.save()
+            if accion != "aprobar":
+                return Response({"error": "Acción inválida. Debe ser 'aprobar' o 'rechazar'."}, status=status.HTTP_400_BAD_REQUEST)
 
-                    Notificacion.objects.create(
-                        usuario=solicitud.alumno,
-                        mensaje=f"Tu solicitud de {cantidad_aprobada} {solicitud.insumo.nombre} ha sido aprobada por el administrador."
-                    )
-                    return Response({"status": "Solicitud aprobada por el administrador."}, status=status.HTTP_200_OK)
+            if desde == "pendiente":
+                # Cambiar estado a pendiente_admin
+                if not SolicitudInsumo.objects.transicionar(solicitud.id, "pendiente", "pendiente_admin"):
+                    return estado_invalido
+                return Response({"status": "Solicitud aprobada por el profesor y enviada al administrador."}, status=status.HTTP_200_OK)
 
-                elif accion == "rechazar":
-                    # Cambiar estado a rechazado y notificar al alumno
-                    solicitud.estado = "rechazado"
-                    solicitud.motivo_rechazo = request.data.get("motivo", "Sin motivo proporcionado.")
-                    solicitud.save()
+            cantidad_aprobada = solicitud.cantidad_solicitada
 
-                    Notificacion.objects.create(
-                        usuario=solicitud.alumno,
-                        mensaje=f"Tu solicitud de {solicitud.cantidad_solicitada} {solicitud.insumo.nombre} ha sido rechazada por el administrador."
-                    )
-                    return Response({"status": "Solicitud rechazada por el administrador."}, status=status.HTTP_200_OK)
-
-            return Response({"error": "Acción inválida. Debe ser 'aprobar' o 'rechazar'."}, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                # Primero el cambio de estado: solo una aprobación simultánea pasa de aquí
+                if not SolicitudInsumo.objects.transicionar(solicitud.id, "pendiente_admin", "aprobado"):
+                    return estado_invalido
+
+                # Reducir del inventario general solo si alcanza (UPDATE condicionado al stock)
+                descontado = Insumo.objects.descontar_stock(solicitud.insumo_id, cantidad_aprobada, 'solicitud', clase=solicitud.clase)
+                if not descontado:
+                    # Deshacer el cambio de estado
+                    transaction.set_rollback(True)
+                else:
+                    self._asignar_extra(solicitud, cantidad_aprobada)
+
+            if not descontado:
+                disponible = Insumo.objects.filter(id=solicitud.insumo_id).values_list('cantidad_total', flat=True).first()
+                return Response(
+                    {"error": f"Inventario general insuficiente. Disponible: {disponible}, solicitado: {cantidad_aprobada}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return Response({"status": "Solicitud aprobada por el administrador."}, status=status.HTTP_200_OK)
 
         except SolicitudInsumo.DoesNotExist:
             return Response({"error": "La solicitud no existe."}, status=status.HTTP_404_NOT_FOUND)
@@ -963,6 +813,48 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
 
 
 
+    def _asignar_extra(self, solicitud, cantidad_aprobada):
+        """
+        Registra la cantidad aprobada como extra del alumno en la clase y le notifica.
+        """
+        # Incremento atómico de la cantidad extra asignada al alumno
+        distribucion, created = ClaseDistribucion.objects.get_or_create(
+            clase_id=solicitud.clase_id,
+            alumno_id=solicitud.alumno_id,
+            insumo_id=solicitud.insumo_id,
+            defaults={"cantidad_asignada": 0, "cantidad_extra_asignada": 0}
+        )
+        ClaseDistribucion.objects.filter(id=distribucion.id).update(
+            cantidad_extra_asignada=F('cantidad_extra_asignada') + cantidad_aprobada
+        )
+        # El UPDATE no dispara signals: renovar la versión de la clase
+        renovar_version_clase(solicitud.clase_id)
+
+        notificar_varios(
+            [solicitud.alumno_id],
+            f"Tu solicitud de {cantidad_aprobada} {solicitud.insumo.nombre} ha sido aprobada por el administrador."
+        )
+
+    @action(detail=False, methods=['post'], url_path='gestionar_lote', permission_classes=[IsAdmin])
+    def gestionar_lote(self, request):
+        """
+        Aprueba o rechaza de una vez varias solicitudes en estado 'pendiente_admin'.
+        Recibe {"ids": [...], "accion": "aprobar" | "rechazar", "motivo": opcional}
+        y devuelve el resultado de cada solicitud.
+        """
+        ids = request.data.get("ids")
+        accion = request.data.get("accion")
+
+        if accion not in ACCIONES_LOTE:
+            return Response({"error": "Acción inválida. Debe ser 'aprobar' o 'rechazar'."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or not ids or not all(isinstance(solicitud_id, int) for solicitud_id in ids):
+            return Response({"error": "Se requiere una lista de ids de solicitudes."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAXIMO_LOTE_SOLICITUDES:
+            return Response({"error": f"Se pueden gestionar hasta {MAXIMO_LOTE_SOLICITUDES} solicitudes por lote."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultados = gestionar_lote(ids, accion, request.data.get("motivo"))
+        return Response({"resultados": resultados}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], url_path='profesor', permission_classes=[IsProfesor])
     def solicitudes_profesor(self, request):
         """
@@ -976,7 +868,7 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
             clase__asignatura__profesor=profesor,
             estado="pendiente",
             es_extra=False  # Excluir solicitudes extraordinarias
-        )
+        ).select_related('alumno', 'insumo')
 
 
         # Serializar las solicitudes
@@ -988,10 +880,10 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
                 "cantidad_solicitada": solicitud.cantidad_solicitada,
                 "unidad_medida": solicitud.insumo.get_unidad_medida_display(),
             }
-            for solicitud in solicitudes
+            for solicitud in self.paginate_queryset(solicitudes)
         ]
 
-        return Response(data, status=status.HTTP_200_OK)
+        return self.get_paginated_response(data)
 
 
     @action(detail=False, methods=['get'], url_path='solicitudes_administrador', permission_classes=[IsAdmin])
@@ -1001,7 +893,7 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
         """
         solicitudes = SolicitudInsumo.objects.filter(
             estado="pendiente_admin"  # Filtrar solo solicitudes que están pendientes del administrador
-        )
+        ).select_related('alumno', 'insumo')
         data = [
             {
                 "id": solicitud.id,
@@ -1009,11 +901,11 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
                 "insumo": solicitud.insumo.nombre,
                 "unidad_medida": solicitud.insumo.get_unidad_medida_display(),
                 "cantidad_solicitada": solicitud.cantidad_solicitada,
-                "clase": solicitud.clase.id,  # Incluimos el ID de la clase para futuras acciones
+                "clase": solicitud.clase_id,  # Incluimos el ID de la clase para futuras acciones
             }
-            for solicitud in solicitudes
+            for solicitud in self.paginate_queryset(solicitudes)
         ]
-        return Response(data, status=status.HTTP_200_OK)
+        return self.get_paginated_response(data)
 
 
     @action(detail=False, methods=['get'], url_path='historial_solicitudes', permission_classes=[AllowAny])
@@ -1021,7 +913,7 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
         """
         Historial de todas las solicitudes de insumos.
         """
-        solicitudes = SolicitudInsumo.objects.select_related('alumno', 'clase', 'clase__asignatura', 'insumo').order_by('-creado_en')
+        solicitudes = SolicitudInsumo.objects.select_related('alumno', 'clase', 'clase__asignatura', 'insumo')
         data = [
             {
                 "alumno": solicitud.alumno.nombre,
@@ -1033,42 +925,9 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
                 "clase": solicitud.clase.nombre,
                 "asignatura": solicitud.clase.asignatura.nombre
             }
-            for solicitud in solicitudes
+            for solicitud in self.paginate_queryset(solicitudes)
         ]
-        return Response({"solicitudes": data}, status=status.HTTP_200_OK)
-    
-    @action(detail=False, methods=['get'], url_path='historial_alumno', permission_classes=[IsAuthenticated])
-    def historial_solicitudes_alumno(self, request):
-        """
-        Devuelve el historial de solicitudes realizadas por el alumno autenticado.
-        """
-        alumno = request.user
-
-        # Verificar que el usuario sea un alumno
-        if alumno.rol != "3":
-            return Response(
-                {"error": "Solo los alumnos pueden acceder a su historial de solicitudes."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
-
-        # Filtrar solicitudes realizadas por el alumno autenticado
-        solicitudes = SolicitudInsumo.objects.filter(alumno=alumno).select_related("insumo", "clase").order_by("-creado_en")
-
-        # Serializar las solicitudes
-        data = [
-            {
-                "id": solicitud.id,
-                "insumo": solicitud.insumo.nombre,
-                "clase": solicitud.clase.nombre,
-                "cantidad_solicitada": solicitud.cantidad_solicitada,
-                "estado": solicitud.estado,
-                "motivo_rechazo": solicitud.motivo_rechazo or "Sin motivo de rechazo especificado",
-                "fecha_solicitud": solicitud.creado_en.strftime("%Y-%m-%d %H:%M:%S"),
-            }
-            for solicitud in solicitudes
-        ]
-
-        return Response(data, status=status.HTTP_200_OK)
+        return self.get_paginated_response(data)
     
     @action(detail=False, methods=['get'], url_path='historial_profesor', permission_classes=[IsAuthenticated])
     def historial_profesor(self, request):
@@ -1101,10 +960,10 @@ class SolicitudInsumoViewSet(viewsets.ModelViewSet):
                 "motivo_rechazo": solicitud.motivo_rechazo,
                 "fecha_solicitud": solicitud.creado_en.strftime("%Y-%m-%d %H:%M:%S"),
             }
-            for solicitud in solicitudes
+            for solicitud in self.paginate_queryset(solicitudes)
         ]
 
-        return Response(data, status=status.HTTP_200_OK)
+        return self.get_paginated_response(data)
 
 
 
@@ -1112,6 +971,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
     queryset = Notificacion.objects.all()
     serializer_class = NotificacionSerializer
     permission_classes = [IsAuthenticated]
+    orden_paginacion = ('-fecha_creacion', '-id')
 
     def get_queryset(self):
         """
@@ -1134,15 +994,14 @@ class NotificacionViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN,
                 )
 
-            # Marcar como leída
-            notificacion.leida = True
-            notificacion.save()
+            # Marcar como leída (no hace nada si ya lo estaba)
+            marcar_leidas(request.user.id, [notificacion.id])
 
             return Response(
                 {
                     "status": "Notificación marcada como leída.",
                     "notificacion_id": notificacion.id,
-                    "leida": notificacion.leida,
+                    "leida": True,
                 },
                 status=status.HTTP_200_OK,
             )
@@ -1152,16 +1011,6 @@ class NotificacionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-    @action(detail=False, methods=['get'], url_path='alumno', permission_classes=[IsAuthenticated])
-    def alumno(self, request):
-        """
-        Devuelve las notificaciones del usuario autenticado.
-        """
-        usuario = request.user
-        notificaciones = Notificacion.objects.filter(usuario=usuario)
-        serializer = self.get_serializer(notificaciones, many=True)
-        return Response(serializer.data)
-
     @action(detail=True, methods=['delete'], url_path='eliminar', permission_classes=[IsAuthenticated])
     def eliminar(self, request, pk=None):
         """
@@ -1178,7 +1027,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
                 )
 
             # Eliminar la notificación
-            notificacion.delete()
+            eliminar_notificaciones(request.user.id, [notificacion.id])
 
             return Response(
                 {"status": "Notificación eliminada correctamente."},
@@ -1188,4 +1037,59 @@ class NotificacionViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": "Notificación no encontrada."},
                 status=status.HTTP_404_NOT_FOUND,
-            )
\ No newline at end of file
+            )
+
+
+    @action(detail=False, methods=['get'], url_path='no_leidas', permission_classes=[IsAuthenticated])
+    def contar_no_leidas(self, request):
+        """
+        Devuelve cuántas notificaciones sin leer tiene el usuario autenticado (contador en caché).
+        """
+        return Response({"no_leidas": no_leidas(request.user.id)}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='marcar_todas_leidas', permission_classes=[IsAuthenticated])
+    def marcar_todas_leidas(self, request):
+        """
+        Marca como leídas todas las notificaciones del usuario autenticado con un único UPDATE.
+        """
+        marcadas = marcar_leidas(request.user.id)
+        return Response(
+            {"status": "Notificaciones marcadas como leídas.", "marcadas": marcadas},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=['post'], url_path='eliminar_lote', permission_classes=[IsAuthenticated])
+    def eliminar_lote(self, request):
+        """
+        Elimina de una vez varias notificaciones del usuario autenticado.
+        Recibe {"ids": [...]}; las que no son del usuario se ignoran.
+        """
+        ids = request.data.get("ids")
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            return Response({"error": "Se requiere una lista de ids de notificaciones."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAXIMO_LOTE_NOTIFICACIONES:
+            return Response({"error": f"Se pueden eliminar hasta {MAXIMO_LOTE_NOTIFICACIONES} notificaciones por lote."}, status=status.HTTP_400_BAD_REQUEST)
+
+        eliminadas = eliminar_notificaciones(request.user.id, ids)
+        return Response(
+            {"status": "Notificaciones eliminadas correctamente.", "eliminadas": eliminadas},
+            status=status.HTTP_200_OK,
+        )
+
+class TareaViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = TareaSerializer
+    permission_classes = [IsAuthenticated]
+    orden_paginacion = ('-creado_en', '-id')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Quien consulta una tarea perdida la ve como fallida, no en proceso para siempre
+        marcar_tareas_vencidas()
+
+    def get_queryset(self):
+        """
+        Cada usuario consulta sus propias tareas; el administrador puede ver todas.
+        """
+        if self.request.user.rol == "1":
+            return Tarea.objects.all()
+        return Tarea.objects.filter(usuario=self.request.user)
@@ -0,0 +1,203 @@
+import json
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Sum
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, condition
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.encoders import JSONEncoder
+from insumosApp.models import Insumo
+from userApp.autenticacion import autenticacion_async
+from back_gestion_insumos.pagination import PaginacionCursor
+from .models import Clase, ClaseInsumo, ClaseDistribucion, SolicitudInsumo, Notificacion
+from .serializers import NotificacionSerializer
+from .eventos import suscribir, canal_clase, canal_usuario
+from .versiones import etag_clase, etag_notificaciones
+from .views import SolicitudInsumoViewSet, NotificacionViewSet
+
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión
+INTERVALO_LATIDO = 15
+
+# Máximo de clases que se siguen en una misma conexión
+MAXIMO_CLASES_EVENTOS = 50
+
+# Milisegundos que espera el navegador antes de reconectar
+ESPERA_RECONEXION = 5000
+
+
+def _evento_sse(tipo, datos):
+    return f"event: {tipo}\ndata: {json.dumps(datos, cls=JSONEncoder, ensure_ascii=False)}\n\n"
+
+
+def _respuesta(datos, status=200):
+    return JsonResponse(datos, status=status, encoder=JSONEncoder, safe=False)
+
+
+def _no_encontrado():
+    return _respuesta({"detail": str(NotFound.default_detail)}, status=404)
+
+
+async def _lista(queryset):
+    return [fila async for fila in queryset]
+
+
+@require_GET
+@autenticacion_async(opcional=True)
+@condition(etag_func=etag_clase)
+async def insumos_asignados(request, pk):
+    """
+    Devuelve los insumos asignados a una clase, incluyendo cantidad total asignada,
+    cantidad repartida y cantidad restante.
+    """
+    # El ORM async ejecuta las consultas una tras otra en el hilo de las consultas sync;
+    # si la clase no existe no se hacen las demás
+    if not await Clase.objects.filter(id=pk).aexists():
+        return _no_encontrado()
+
+    insumos = await _lista(ClaseInsumo.objects.filter(clase_id=pk).select_related('insumo'))
+    repartido = await _lista(
+        # Excluir cualquier distribución genérica o extraordinaria
+        ClaseDistribucion.objects.filter(clase_id=pk, alumno__isnull=False)
+        .values_list('insumo_id').annotate(total=Sum('cantidad_asignada'))
+    )
+
+    unidad_medida_dict = dict(Insumo.MEDIDAS)
+    repartido = dict(repartido)
+
+    insumos_data = []
+    for insumo_clase in insumos:
+        cantidad_repartida = repartido.get(insumo_clase.insumo_id) or 0
+        # Prevenir resultados negativos en cantidad restante
+        cantidad_restante = max(0, insumo_clase.cantidad - cantidad_repartida)
+
+        insumos_data.append({
+            'id': insumo_clase.insumo.id,
+            'nombre': insumo_clase.insumo.nombre,
+            'unidad_medida': unidad_medida_dict.get(insumo_clase.insumo.unidad_medida, "Desconocido"),
+            'total_cantidad': insumo_clase.cantidad,  # Cantidad total asignada a la clase
+            'cantidad_repartida': round(cantidad_repartida, 2),  # Cantidad distribuida entre alumnos
+            'cantidad_restante': round(cantidad_restante, 2),  # Cantidad aún no distribuida
+        })
+
+    return _respuesta({'insumos': insumos_data})
+
+
+@require_GET
+@autenticacion_async(roles=("3",))
+async def mis_insumos(request, pk):
+    """
+    Devuelve los insumos distribuidos a un alumno en una clase específica.
+    """
+    if not await Clase.objects.filter(id=pk).aexists():
+        return _no_encontrado()
+
+    distribuciones = await _lista(
+        ClaseDistribucion.objects.filter(clase_id=pk, alumno=request.user).select_related('insumo')
+    )
+
+    data = [
+        {
+            "insumo": distribucion.insumo.nombre,
+            "cantidad_asignada": distribucion.cantidad_asignada,
+            "cantidad_extra_asignada": distribucion.cantidad_extra_asignada,
+            "unidad_medida": distribucion.insumo.get_unidad_medida_display(),
+        }
+        for distribucion in distribuciones
+    ]
+    return _respuesta({"insumos": data})
+
+
+@require_GET
+@autenticacion_async()
+@condition(etag_func=etag_notificaciones)
+async def notificaciones_alumno(request):
+    """
+    Devuelve las notificaciones del usuario autenticado, paginadas por cursor.
+    """
+    paginador = PaginacionCursor()
+    pagina = await paginador.apaginar_queryset(Notificacion.objects.filter(usuario=request.user), request, NotificacionViewSet)
+    return _respuesta(paginador.datos_paginados(NotificacionSerializer(pagina, many=True).data))
+
+
+@require_GET
+@autenticacion_async()
+async def historial_alumno(request):
+    """
+    Devuelve el historial de solicitudes realizadas por el alumno autenticado, paginado por cursor.
+    """
+    if request.user.rol != "3":
+        return _respuesta(
+            {"error": "Solo los alumnos pueden acceder a su historial de solicitudes."}, status=403,
+        )
+
+    paginador = PaginacionCursor()
+    solicitudes = SolicitudInsumo.objects.filter(alumno=request.user).select_related("insumo", "clase")
+    pagina = await paginador.apaginar_queryset(solicitudes, request, SolicitudInsumoViewSet)
+    data = [
+        {
+            "id": solicitud.id,
+            "insumo": solicitud.insumo.nombre,
+            "clase": solicitud.clase.nombre,
+            "cantidad_solicitada": solicitud.cantidad_solicitada,
+            "estado": solicitud.estado,
+            "motivo_rechazo": solicitud.motivo_rechazo or "Sin motivo de rechazo especificado",
+            "fecha_solicitud": solicitud.creado_en.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        for solicitud in pagina
+    ]
+    return _respuesta(paginador.datos_paginados(data))
+
+
+@require_GET
+@autenticacion_async(token_en_parametro=True)
+async def eventos(request):
+    """
+    Stream de Server-Sent Events con los cambios de estado y de asistencia de las clases
+    indicadas en `?clases=1,2` y las notificaciones nuevas del usuario autenticado.
+
+    Al conectar se envía el estado actual de cada clase, así que al reconectar no hace falta
+    consultar nada más. Requiere un servidor ASGI (por ejemplo, uvicorn con
+    `back_gestion_insumos.asgi:application`); los eventos son los publicados en el mismo proceso.
+    Bajo WSGI se rechaza con 501: el stream no termina nunca y ocuparía un hilo del servidor
+    por cada pestaña abierta.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "El stream de eventos requiere un servidor ASGI (por ejemplo, uvicorn)."}, status=501,
+        )
+
+    usuario = request.user
+
+    try:
+        clases_ids = list(dict.fromkeys(int(clase_id) for clase_id in request.GET.get('clases', '').split(',') if clase_id))
+    except ValueError:
+        return JsonResponse({"error": "El parámetro 'clases' debe ser una lista de ids separados por comas."}, status=400)
+    if len(clases_ids) > MAXIMO_CLASES_EVENTOS:
+        return JsonResponse({"error": f"Se pueden seguir hasta {MAXIMO_CLASES_EVENTOS} clases por conexión."}, status=400)
+
+    # Suscribirse antes de leer el estado actual para no perder cambios intermedios
+    suscripcion = suscribir([canal_usuario(usuario.id), *(canal_clase(clase_id) for clase_id in clases_ids)])
+
+    async def generar():
+        try:
+            yield f"retry: {ESPERA_RECONEXION}\n\n"
+
+            clases = Clase.objects.filter(id__in=clases_ids).annotate(total_participantes=Count('participaciones'))
+            async for clase in clases.values('id', 'nombre', 'estado', 'total_participantes'):
+                yield _evento_sse('clase', {'id': clase['id'], 'nombre': clase['nombre'], 'estado': clase['estado']})
+                yield _evento_sse('asistencia', {'clase_id': clase['id'], 'total_participantes': clase['total_participantes']})
+
+            while True:
+                evento = await suscripcion.siguiente(INTERVALO_LATIDO)
+                if evento is None:
+                    yield ": latido\n\n"
+                else:
+                    yield _evento_sse(evento['tipo'], evento['datos'])
+        finally:
+            # El cliente se desconectó (o el servidor se detiene)
+            suscripcion.cancelar()
+
+    respuesta = StreamingHttpResponse(generar(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    # Evita que un proxy (por ejemplo, nginx) acumule los eventos antes de enviarlos
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
@@ -0,0 +1,64 @@
+from functools import wraps
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import Usuario
+
+
+def token_de_solicitud(request, token_en_parametro=False):
+    """
+    Extrae el token de acceso de la cabecera Authorization ("Bearer <token>"). Con
+    `token_en_parametro`, si no viene la cabecera se toma del parámetro `token`; solo para
+    los streams de eventos (EventSource no permite enviar cabeceras), porque un token en la
+    URL queda en los registros de acceso, los proxies y el Referer.
+    """
+    cabecera = request.headers.get('Authorization', '').split()
+    if len(cabecera) == 2 and cabecera[0] in api_settings.AUTH_HEADER_TYPES:
+        return cabecera[1]
+    if token_en_parametro:
+        return request.GET.get('token')
+    return None
+
+
+async def ausuario_de_solicitud(request, token_en_parametro=False):
+    """
+    Versión async de la autenticación JWT para las vistas que no pasan por DRF.
+    Devuelve el usuario activo del token o None si falta o no es válido.
+    """
+    token = token_de_solicitud(request, token_en_parametro)
+    if not token:
+        return None
+    try:
+        # Validar la firma y la expiración no consulta la base de datos
+        validado = JWTAuthentication().get_validated_token(token)
+        usuario_id = validado[api_settings.USER_ID_CLAIM]
+    except (TokenError, InvalidToken, KeyError):
+        return None
+    try:
+        return await Usuario.objects.aget(**{api_settings.USER_ID_FIELD: usuario_id}, is_active=True)
+    except Usuario.DoesNotExist:
+        return None
+
+
+def autenticacion_async(roles=None, opcional=False, token_en_parametro=False):
+    """
+    Decorador para vistas async: autentica con JWT y deja el usuario en `request.user`,
+    como haría DRF. Responde 401 si no hay usuario (salvo con `opcional`) y 403 si su
+    rol no está en `roles`, con los mismos mensajes que los permisos de DRF.
+    `token_en_parametro` acepta también `?token=` (ver token_de_solicitud).
+    """
+    def decorador(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            usuario = await ausuario_de_solicitud(request, token_en_parametro)
+            if usuario is None and not opcional:
+                return JsonResponse({"detail": str(NotAuthenticated.default_detail)}, status=401)
+            if roles is not None and (usuario is None or usuario.rol not in roles):
+                return JsonResponse({"detail": str(PermissionDenied.default_detail)}, status=403)
+            request.user = usuario or AnonymousUser()
+            return await vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
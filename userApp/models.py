@@ -25,7 +25,7 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     ]
     nombre = models.CharField(max_length=50)
     email = models.EmailField(unique=True)
-    rol = models.CharField(choices=ROL, max_length=55)
+    rol = models.CharField(choices=ROL, max_length=55, db_index=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
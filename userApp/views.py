@@ -49,17 +49,17 @@ class UsuarioView(viewsets.ModelViewSet):
         Devuelve todos los usuarios con el rol de alumno (rol 3).
         """
         alumnos = Usuario.objects.filter(rol=3)
-        serializer = self.get_serializer(alumnos, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(self.paginate_queryset(alumnos), many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='listar_usuarios', permission_classes=[IsAdmin])
     def listar_usuarios(self, request):
         """
         Devuelve la lista de todos los usuarios registrados.
         """
-        usuarios = Usuario.objects.all().order_by('id')
-        serializer = self.get_serializer(usuarios, many=True)
-        return Response(serializer.data)
+        usuarios = Usuario.objects.all()
+        serializer = self.get_serializer(self.paginate_queryset(usuarios), many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['patch', 'put'], url_path='editar', permission_classes=[IsAdmin])
     def editar_usuario(self, request, pk=None):
@@ -86,14 +86,12 @@ class UsuarioView(viewsets.ModelViewSet):
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
-class UsuarioPorRolView(APIView):
+class UsuarioPorRolView(generics.ListAPIView):
+    serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        rol = request.query_params.get('rol')
+    def get_queryset(self):
+        rol = self.request.query_params.get('rol')
         if rol is not None:
-            usuarios = Usuario.objects.filter(rol=rol)
-        else:
-            usuarios = Usuario.objects.all()
-        serializer = UsuarioSerializer(usuarios, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+            return Usuario.objects.filter(rol=rol)
+        return Usuario.objects.all()
\ No newline at end of file